@@ -0,0 +1,63 @@
+import unicodedata
+
+
+def fold(text):
+    """
+    Fold the text for comparing names - lower case without diacritics ("Čáslav" -> "caslav").
+    """
+    decomposed = unicodedata.normalize("NFD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def _name_key(name):
+    """
+    Sort key of a name - alphabetically regardless of diacritics and case, ties by the exact name.
+    """
+    return fold(name), name
+
+
+class AdminIndex:
+    """
+    The kraj → okres → obec hierarchy for cascading selection of an obec.
+
+    The lists shown in the comboboxes are sorted once when the index is built, selecting a kraj
+    or okres and looking up the kod_obce of the selected obec are then only dictionary lookups.
+    """
+
+    def __init__(self, okresy, obce):
+        """
+        Parameters:
+        okresy (iterable): Tuples (kraj name, okres name) of all okresy.
+        obce (iterable): Tuples (okres name, obec name, kod_obce) of all obce, parts of one obec may repeat.
+        """
+        okresy_in_kraj = {}
+        for kraj, okres in okresy:
+            okresy_in_kraj.setdefault(kraj, set()).add(okres)
+        self._okresy = {kraj: sorted(names, key=_name_key) for kraj, names in okresy_in_kraj.items()}
+
+        # The first obec of the name in the okres is used, as by selecting it from the layer before
+        self._kody = {}
+        obce_in_okres = {}
+        for okres, name, kod_obce in obce:
+            if (okres, name) not in self._kody:
+                self._kody[(okres, name)] = int(kod_obce)
+                obce_in_okres.setdefault(okres, []).append(name)
+        self._obec_names = {okres: sorted(names, key=_name_key) for okres, names in obce_in_okres.items()}
+
+    def okresy(self, kraj):
+        """
+        Return the sorted names of okresy in the kraj (empty list for an unknown kraj).
+        """
+        return self._okresy.get(kraj, [])
+
+    def obec_names(self, okres):
+        """
+        Return the sorted names of obce in the okres (empty list for an unknown okres).
+        """
+        return self._obec_names.get(okres, [])
+
+    def kod_obce(self, okres, name):
+        """
+        Return the kod_obce of the obec with the name in the okres, None if there is no such obec.
+        """
+        return self._kody.get((okres, name))
@@ -0,0 +1,212 @@
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from xml.parsers.expat import ExpatError
+
+from geo_store import read_layer, KRAJ_COLUMNS, OKRES_COLUMNS, OBCE_PATH
+from gpx_ledger import plan_import, read_visits, record_import
+from gpx_stream import merge_first_visits, MODE_POINTS, MODE_SEGMENTS
+from reverse_geocoder import ReverseGeocoder
+from stats_engine import CoverageStats
+from track_archive import TrackArchive, TrackCollector
+from visit_store import VisitStore
+
+DB_PATH = os.path.join("database", "users.db")
+
+# The spatial index of obce of the worker process, built once by _init_worker
+_geocoder = None
+
+
+def _init_worker(obce_path):
+    """
+    Build the spatial index of obce once per worker process.
+    The layer is memory-mapped from the geodata cache built by the parent process, so all workers
+    read the same pages.
+    """
+    global _geocoder
+    _geocoder = ReverseGeocoder(read_layer(obce_path))
+
+
+def _match_file(plan, staging):
+    """
+    Find the obce visited by the new points of one GPX file in the worker process.
+    The points are written to the staging archive as they are read, only its path goes back to the parent.
+
+    Returns:
+    tuple: (plan, {kod_obce: date of the first visit}, position of the last point, staging archive, None)
+    or (plan, None, None, None, error message).
+    """
+    collector = TrackCollector(os.path.basename(plan.path), staging)
+    try:
+        return plan, *read_visits(plan, _geocoder, collector), staging, None
+    except (OSError, TypeError, ValueError, KeyError, ExpatError) as e:
+        staging.remove()
+        return plan, None, None, None, str(e)
+
+
+def find_gpx_files(patterns):
+    """
+    Expand directories (all *.gpx files in them, recursively), glob patterns and file paths.
+
+    Parameters:
+    patterns (list): Directories, glob patterns or paths of GPX files.
+
+    Returns:
+    list: Sorted paths of the GPX files without duplicates.
+    """
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.update(glob.glob(os.path.join(pattern, "**", "*.gpx"), recursive=True))
+        elif glob.has_magic(pattern):
+            paths.update(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+        else:
+            paths.add(pattern)
+    return sorted(paths)
+
+
+def import_tracks(user, paths, mode=MODE_SEGMENTS, workers=None, db_path=DB_PATH):
+    """
+    Import many GPX files of the user at once.
+
+    Files imported by the user before are looked up in the import ledger, only new files and
+    new points appended to the old files are read. They are parsed and assigned to obce in parallel
+    worker processes, the first visits of all files are merged and written to the database
+    in one transaction. The new points are stored in the track archive of the user (through staging
+    archives written by the workers).
+
+    Parameters:
+    user (str): The name of an existing user.
+    paths (list): Paths of the GPX files.
+    mode (str): MODE_POINTS or MODE_SEGMENTS, see gpx_stream.first_visits.
+    workers (int): The number of worker processes, None for the number of CPUs.
+    db_path (str): The path to the database.
+
+    Returns:
+    tuple: (number of obce found in the files, number of visits added, list of (path, error) of failed files).
+    """
+    visit_store = VisitStore(db_path)
+    try:
+        if user not in visit_store.users():
+            raise ValueError(f"uzivatel neexistuje: {user}")
+
+        visits = {}
+        failed = []
+        plans = []
+        archive = TrackArchive(user)
+        for path in paths:
+            try:
+                plan = plan_import(visit_store, user, path, mode)
+            except OSError as e:
+                print(f"chyba: {path}: {e}")
+                failed.append((path, str(e)))
+                continue
+            if plan.start is None:
+                print(f"soubor uz byl nacten: {path} ({len(plan.matches)} obci)")
+                merge_first_visits(visits, plan.matches)
+            else:
+                plans.append(plan)
+
+        # The layer is read (and the geodata cache built) here, before the workers memory-map it
+        obce = read_layer(OBCE_PATH)
+        if plans:
+            done = set()
+            stagings = [archive.staging(idx) for idx in range(len(plans))]
+            try:
+                with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                         initargs=(OBCE_PATH,)) as executor:
+                    for plan, file_visits, position, staging, error in executor.map(_match_file, plans, stagings):
+                        done.add(plan.path)
+                        if error is not None:
+                            print(f"chyba: {plan.path}: {error}")
+                            failed.append((plan.path, error))
+                            continue
+                        print(f"soubor nacten: {plan.path} ({len(file_visits)} obci, od bajtu {plan.start})")
+                        record_import(visit_store, user, plan, file_visits, position)
+                        archive.append(staging)
+                        merge_first_visits(visits, file_visits)
+            except BrokenProcessPool as e:
+                for plan, staging in zip(plans, stagings):
+                    if plan.path not in done:
+                        print(f"chyba: {plan.path}: {e}")
+                        failed.append((plan.path, str(e)))
+                        staging.remove()
+
+        # Region codes of obce for updating the coverage counters together with the visits
+        visit_store.set_regions(CoverageStats(obce, KRAJ_COLUMNS[OBCE_PATH], OKRES_COLUMNS[OBCE_PATH]))
+        added = visit_store.add_visits(user, visits.items())
+    finally:
+        visit_store.close()
+    return len(visits), added, failed
+
+
+def rematch_tracks(user, mode=MODE_SEGMENTS, db_path=DB_PATH):
+    """
+    Find the obce visited by all tracks in the archive of the user again (e.g. after the obce were updated)
+    and add the visits of the obce not visited yet, without the GPX files.
+
+    Returns:
+    tuple: (number of obce found in the tracks, number of visits added).
+    """
+    obce = read_layer(OBCE_PATH)
+    visits = TrackArchive(user).rematch(ReverseGeocoder(obce), mode)
+
+    visit_store = VisitStore(db_path)
+    try:
+        if user not in visit_store.users():
+            raise ValueError(f"uzivatel neexistuje: {user}")
+        visit_store.set_regions(CoverageStats(obce, KRAJ_COLUMNS[OBCE_PATH], OKRES_COLUMNS[OBCE_PATH]))
+        added = visit_store.add_visits(user, visits.items())
+    finally:
+        visit_store.close()
+    return len(visits), added
+
+
+def cli(argv=None):
+    """
+    Command-line entry point: python main.py <user> <directory, glob or GPX file>...
+    or python main.py --rematch <user> to match the archived tracks of the user again.
+
+    Returns:
+    int: The exit status, 0 if all files were imported.
+    """
+    parser = argparse.ArgumentParser(prog="geolog",
+                                     description="Hromadný import GPX souborů bez grafického rozhraní.")
+    parser.add_argument("user", help="jméno existujícího uživatele")
+    parser.add_argument("paths", nargs="*", help="adresáře, vzory (např. 'stopy/2024-*.gpx') nebo GPX soubory")
+    parser.add_argument("--workers", type=int, default=None, help="počet procesů (výchozí: počet jader)")
+    parser.add_argument("--points", action="store_true",
+                        help="hledat obce jen podle bodů trasy, ne podle úseků mezi nimi")
+    parser.add_argument("--db", default=DB_PATH, help="cesta k databázi")
+    parser.add_argument("--rematch", action="store_true",
+                        help="znovu přiřadit obce všem uloženým trasám uživatele (např. po aktualizaci obcí)")
+    args = parser.parse_args(argv)
+    mode = MODE_POINTS if args.points else MODE_SEGMENTS
+
+    if args.rematch:
+        try:
+            found, added = rematch_tracks(args.user, mode, args.db)
+        except ValueError as e:
+            print(e)
+            return 1
+        print(f"obci nalezeno: {found}, obci pridano: {added}")
+        return 0
+
+    paths = find_gpx_files(args.paths)
+    if not paths:
+        print("zadne GPX soubory")
+        return 1
+
+    try:
+        found, added, failed = import_tracks(args.user, paths, mode, args.workers, args.db)
+    except ValueError as e:
+        print(e)
+        return 1
+    print(f"souboru: {len(paths)}, obci nalezeno: {found}, obci pridano: {added}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(cli())
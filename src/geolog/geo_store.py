@@ -0,0 +1,289 @@
+import json
+import os
+
+import geopandas as gpd
+import pandas as pd
+import shapely
+
+from topology import ARCS_VERSION, build_arcs, SNAP_GRID
+
+try:
+    # GeoPandas needs pyarrow to read and write the Feather cache
+    import pyarrow  # noqa: F401
+except ImportError:
+    pyarrow = None
+
+KRAJE_PATH = "geodata/kraje.shp"
+OKRESY_PATH = "geodata/okresy.shp"
+OBCE_PATH = "geodata/obce_generalized.shp"
+
+# Column with the name of the kraj or of the okres of each feature of the layers
+KRAJ_COLUMNS = {
+    OKRESY_PATH: "Název_kra",
+    OBCE_PATH: "nazev_kraj"
+}
+OKRES_COLUMNS = {
+    OKRESY_PATH: "Název_okr",
+    OBCE_PATH: "nazev_okre"
+}
+
+# Attributes used by the app, all other columns of the Shapefiles are dropped at load time
+LAYER_COLUMNS = {
+    KRAJE_PATH: ["nazev"],
+    OKRESY_PATH: ["Název_okr", "Název_kra"],
+    OBCE_PATH: ["kod_obce", "nazev_obce", "nazev_okre", "nazev_kraj"]
+}
+# Compact types of the attributes - names of okresy and kraje are categories (an integer code per row
+# and every name stored once), kod_obce (6 digits) fits into int32
+LAYER_DTYPES = {
+    OBCE_PATH: {"kod_obce": "int32", "nazev_okre": "category", "nazev_kraj": "category"}
+}
+
+# Directory of the binary (Feather) copies of the Shapefiles
+CACHE_DIRECTORY = "geodata/cache"
+# Files of the Shapefile whose change invalidates the cache
+SHAPEFILE_PARTS = (".shp", ".shx", ".dbf", ".prj", ".cpg")
+
+# Simplification tolerance (metres) of the level-of-detail pyramid, 0 is the full resolution
+LOD_TOLERANCES = {
+    "okres": 0.0,
+    "kraj": 50.0,
+    "country": 250.0
+}
+
+
+def _source_signature(path):
+    """
+    Return size and modification time of all files of the Shapefile.
+    """
+    base = os.path.splitext(path)[0]
+    signature = {}
+    for extension in SHAPEFILE_PARTS:
+        part = base + extension
+        if os.path.exists(part):
+            stat = os.stat(part)
+            signature[extension] = [stat.st_size, stat.st_mtime_ns]
+    return signature
+
+
+def _read_cached(name, signature, build, cache_directory):
+    """
+    Return the GeoDataFrame stored in the cache under the name if it was built for the same signature.
+    Otherwise build it and store it in the cache for the next start.
+    """
+    if pyarrow is None or cache_directory is None:
+        return build()
+
+    cache_path = os.path.join(cache_directory, name + ".feather")
+    signature_path = os.path.join(cache_directory, name + ".json")
+
+    try:
+        with open(signature_path, "r") as file:
+            if json.load(file) == signature:
+                return gpd.read_feather(cache_path, memory_map=True)
+    except (OSError, ValueError):
+        pass
+
+    # The cache is missing or outdated - build the data and store it for the next start.
+    # Both files are written under temporary names and then replaced, so another process never
+    # reads a half-written file, the Feather file goes first so the signature never describes an old one.
+    gdf = build()
+    temporary = f".{os.getpid()}.tmp"
+    try:
+        os.makedirs(cache_directory, exist_ok=True)
+        gdf.to_feather(cache_path + temporary, compression="uncompressed")
+        os.replace(cache_path + temporary, cache_path)
+        with open(signature_path + temporary, "w") as file:
+            json.dump(signature, file)
+        os.replace(signature_path + temporary, signature_path)
+    except OSError as e:
+        print(f'Error occurred while writing geodata cache: {e}')
+        for path in (cache_path + temporary, signature_path + temporary):
+            if os.path.exists(path):
+                os.remove(path)
+    return gdf
+
+
+def _layer_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def read_layer(path, cache_directory=CACHE_DIRECTORY):
+    """
+    Read the Shapefile with only the columns used by the app, converted to the compact types of LAYER_DTYPES.
+
+    The first read converts the Shapefile to an uncompressed Feather (Arrow) file in the cache
+    directory, later reads memory-map this file instead of parsing the Shapefile. The cache is
+    rebuilt whenever size or modification time of any file of the Shapefile changes.
+
+    Parameters:
+    path (str): The path to the Shapefile.
+    cache_directory (str): The directory with the cached layers, None to disable the cache.
+
+    Returns:
+    geopandas.GeoDataFrame: The layer.
+    """
+    columns = LAYER_COLUMNS.get(path)
+    dtypes = LAYER_DTYPES.get(path, {})
+    signature = {"columns": columns, "dtypes": dtypes, "source": _source_signature(path)}
+
+    def build():
+        return gpd.read_file(path, columns=columns).astype(dtypes)
+
+    return _read_cached(_layer_name(path), signature, build, cache_directory)
+
+
+def coverage_simplify_supported():
+    """
+    Return True if shapely and GEOS can simplify a coverage (shapely 2.1 and GEOS 3.12 or newer).
+    """
+    return hasattr(shapely, "coverage_simplify") and shapely.geos_version >= (3, 12, 0)
+
+
+def lod_tolerances():
+    """
+    Return the tolerances of the levels of detail which can be built.
+
+    Simplifying every polygon alone would move the vertices of the borders shared by neighbouring
+    obce, so topology.build_arcs could not match them. Without coverage simplification only
+    the full resolution is used.
+    """
+    if coverage_simplify_supported():
+        return tuple(LOD_TOLERANCES.values())
+    return (0.0,)
+
+
+def simplify_coverage(geometries, tolerance):
+    """
+    Simplify polygons covering an area without gaps (obce, okresy, kraje) so that the borders
+    shared by neighbouring polygons stay identical. Needs coverage_simplify_supported().
+
+    Parameters:
+    geometries (array-like): The polygons of the layer.
+    tolerance (float): The simplification tolerance in metres.
+
+    Returns:
+    numpy.ndarray: The simplified polygons in the same order.
+    """
+    return shapely.coverage_simplify(geometries, tolerance)
+
+
+class GeoDataStore:
+    """
+    In-memory store of the shapefile layers used by GeoLog.
+
+    Every layer is read from disk only once, the first time it is requested. Bounds of kraje
+    and okresy are cached as well, so redrawing the map after a user switch, obec add/remove
+    or zoom change does no disk I/O.
+    """
+
+    def __init__(self, cache_directory=CACHE_DIRECTORY):
+        """
+        Parameters:
+        cache_directory (str): The directory with the cached layers and levels of detail, None to disable the cache.
+        """
+        self.cache_directory = cache_directory
+        self._layers = {}
+        self._bounds = {}
+        self._simplified = {}
+        self._arcs = {}
+
+    def layer(self, path):
+        """
+        Return the whole layer stored in the Shapefile.
+
+        Parameters:
+        path (str): The path to the Shapefile.
+
+        Returns:
+        geopandas.GeoDataFrame: The layer, read from disk (or the binary cache) on the first call only.
+        """
+        if path not in self._layers:
+            self._layers[path] = read_layer(path, self.cache_directory)
+        return self._layers[path]
+
+    def geometries(self, path, tolerance=0.0):
+        """
+        Return the geometries of the layer simplified for a level of the level-of-detail pyramid.
+
+        Each level is computed only once (and stored in the binary cache), borders shared by
+        neighbouring features stay topologically consistent.
+
+        Parameters:
+        path (str): The path to the Shapefile.
+        tolerance (float): The simplification tolerance in metres, one of lod_tolerances().
+
+        Returns:
+        numpy.ndarray: The geometries in the order of the layer rows.
+        """
+        gdf = self.layer(path)
+        if not tolerance:
+            return gdf.geometry.values
+
+        key = (path, tolerance)
+        if key not in self._simplified:
+            signature = {"tolerance": tolerance, "source": _source_signature(path)}
+
+            def build():
+                return gpd.GeoDataFrame(geometry=simplify_coverage(gdf.geometry.values, tolerance), crs=gdf.crs)
+
+            name = f"{_layer_name(path)}.lod{tolerance:g}"
+            self._simplified[key] = _read_cached(name, signature, build, self.cache_directory).geometry.values
+        return self._simplified[key]
+
+    def arcs(self, tolerance=0.0):
+        """
+        Return the unique boundary arcs of obce for a level of the level-of-detail pyramid.
+
+        Borders of okresy and kraje are the arcs between obce of different okres/kraj, so every
+        border is stored and drawn only once. Each level is built only once (and stored in the binary cache).
+
+        Parameters:
+        tolerance (float): The simplification tolerance in metres, one of lod_tolerances().
+
+        Returns:
+        geopandas.GeoDataFrame: The arcs with columns 'level' (topology.LEVEL_*), 'left' and 'right'
+        (positions of the obce on both sides, topology.NO_NEIGHBOUR on the state border).
+
+        Raises:
+        ValueError: If the obce do not share the vertices of their borders, see topology.build_arcs.
+        """
+        if tolerance not in self._arcs:
+            obce = self.layer(OBCE_PATH)
+            signature = {"tolerance": tolerance, "topology": [ARCS_VERSION, SNAP_GRID],
+                         "source": _source_signature(OBCE_PATH)}
+
+            def build():
+                lines, level, left, right = build_arcs(self.geometries(OBCE_PATH, tolerance),
+                                                       pd.factorize(obce[OKRES_COLUMNS[OBCE_PATH]])[0],
+                                                       pd.factorize(obce[KRAJ_COLUMNS[OBCE_PATH]])[0])
+                return gpd.GeoDataFrame({"level": level, "left": left, "right": right}, geometry=lines, crs=obce.crs)
+
+            name = f"{_layer_name(OBCE_PATH)}.arcs{tolerance:g}"
+            self._arcs[tolerance] = _read_cached(name, signature, build, self.cache_directory)
+        return self._arcs[tolerance]
+
+    def _bounds_index(self, column_name):
+        """
+        Return {name: (minx, miny, maxx, maxy)} of all kraje/okresy, computed from obce in one pass.
+        """
+        if column_name not in self._bounds:
+            obce = self.layer(OBCE_PATH)
+            bounds = obce.bounds
+            bounds[column_name] = obce[column_name]
+            bounds = bounds.groupby(column_name, observed=True).agg({'minx': 'min', 'miny': 'min',
+                                                                    'maxx': 'max', 'maxy': 'max'})
+            self._bounds[column_name] = {name: tuple(row) for name, row in zip(bounds.index, bounds.to_numpy())}
+        return self._bounds[column_name]
+
+    def kraj_bounds(self, nazev_kraj):
+        """
+        Return the bounding box (minx, miny, maxx, maxy) of the kraj, None for unknown kraj.
+        """
+        return self._bounds_index(KRAJ_COLUMNS[OBCE_PATH]).get(nazev_kraj)
+
+    def okres_bounds(self, nazev_okres):
+        """
+        Return the bounding box (minx, miny, maxx, maxy) of the okres, None for unknown okres.
+        """
+        return self._bounds_index(OKRES_COLUMNS[OBCE_PATH]).get(nazev_okres)
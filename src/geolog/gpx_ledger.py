@@ -0,0 +1,145 @@
+import hashlib
+import os
+from typing import NamedTuple
+
+from gpx_stream import first_visits, merge_first_visits, READ_BLOCK
+from track_archive import TrackCollector
+from visit_store import ImportRecord
+
+
+class ImportPlan(NamedTuple):
+    """
+    What has to be read from a GPX file to import it, decided by the import ledger.
+
+    start - byte offset of the first track point to read, 0 for the whole file, None if the same file
+            was already imported (nothing to read)
+    points - the number of track points before start
+    matches - {kod_obce: date of the first visit} found in the points before start (the whole file if start is None)
+    """
+    path: str
+    mode: str
+    size: int
+    sha256: str
+    start: int | None
+    points: int
+    matches: dict
+
+
+def file_hashes(path, prefix_length=None):
+    """
+    Return the SHA-256 (hex) of the whole file and of its first prefix_length bytes, in one pass.
+
+    Parameters:
+    path (str): The path to the file.
+    prefix_length (int): The length of the prefix, None to skip the hash of the prefix.
+
+    Returns:
+    tuple: (hash of the file, hash of the prefix or None if the file is shorter or prefix_length is None).
+    """
+    whole = hashlib.sha256()
+    prefix = None
+    read = 0
+    with open(path, "rb") as file:
+        while True:
+            block = file.read(READ_BLOCK)
+            if prefix_length is not None and prefix is None and read + len(block) >= prefix_length:
+                prefix = whole.copy()
+                prefix.update(block[:prefix_length - read])
+            if not block:
+                break
+            whole.update(block)
+            read += len(block)
+    return whole.hexdigest(), prefix.hexdigest() if prefix is not None else None
+
+
+def plan_import(visit_store, name, path, mode):
+    """
+    Decide what has to be read from the GPX file using the import ledger of the user.
+
+    A file with the same content imported before is not read at all, its stored matches are used.
+    A file which only has new track points appended since the last import from the same path
+    (same bytes before the last stored point) is read from that point on.
+
+    Parameters:
+    visit_store (visit_store.VisitStore): The database with the ledger.
+    name (str): The name of the user.
+    path (str): The path to the GPX file.
+    mode (str): MODE_POINTS or MODE_SEGMENTS, see gpx_stream.first_visits.
+
+    Returns:
+    ImportPlan: The part of the file to read.
+    """
+    path = os.path.abspath(path)
+    size = os.path.getsize(path)
+    last = visit_store.last_import(name, path, mode)
+    resume_offset = last.resume_offset if last is not None and last.resume_offset < size else None
+    sha256, resume_sha256 = file_hashes(path, resume_offset)
+
+    same = last if last is not None and last.sha256 == sha256 else visit_store.find_import(name, sha256, mode)
+    if same is not None:
+        return ImportPlan(path, mode, size, sha256, None, same.points, same.matches)
+    if resume_sha256 is not None and resume_sha256 == last.resume_sha256:
+        # the last stored point is read again, so that it is joined with the appended ones (MODE_SEGMENTS)
+        return ImportPlan(path, mode, size, sha256, resume_offset, last.points - 1, last.matches)
+    return ImportPlan(path, mode, size, sha256, 0, 0, {})
+
+
+def read_visits(plan, geocoder, collector=None):
+    """
+    Find the obce visited by the points of the plan not read before.
+
+    Parameters:
+    plan (ImportPlan): The part of the file to read, start must not be None.
+    geocoder (ReverseGeocoder): The spatial index of obce.
+    collector (track_archive.TrackCollector): Writes the points read to a track archive, None to skip.
+
+    Returns:
+    tuple: (matches of the whole file {kod_obce: date}, position of the last point - see gpx_stream.iter_gpx_chunks).
+    """
+    position = {}
+    matches = dict(plan.matches)
+    merge_first_visits(matches, first_visits(plan.path, geocoder, plan.mode, start=plan.start, position=position,
+                                             on_chunk=collector))
+    if collector is not None:
+        collector.flush()
+    return matches, position
+
+
+def record_import(visit_store, name, plan, matches, position):
+    """
+    Store the imported file in the ledger, files without any track point are not stored.
+    """
+    if position["last_point"] is None:
+        return
+    _, resume_sha256 = file_hashes(plan.path, position["last_point"])
+    visit_store.record_import(name, ImportRecord(plan.path, plan.mode, plan.size, plan.sha256,
+                                                 plan.points + position["points"], position["last_point"],
+                                                 resume_sha256, matches))
+
+
+def import_gpx(visit_store, name, path, geocoder, mode, archive=None):
+    """
+    Find the obce visited by the GPX file, reading only the points not imported by the user before.
+    The points read are stored in the track archive of the user if it is given, through a staging
+    archive moved to it once the whole file was read.
+
+    Returns:
+    dict: {kod_obce: date of the first visit} of the whole file.
+    """
+    plan = plan_import(visit_store, name, path, mode)
+    if plan.start is None:
+        print("soubor uz byl nacten: " + plan.path)
+        return plan.matches
+
+    staging = archive.staging("import") if archive is not None else None
+    collector = TrackCollector(os.path.basename(plan.path), staging) if staging is not None else None
+    try:
+        matches, position = read_visits(plan, geocoder, collector)
+    except Exception:
+        if staging is not None:
+            staging.remove()
+        raise
+    record_import(visit_store, name, plan, matches, position)
+    if archive is not None:
+        archive.append(staging)
+    return matches
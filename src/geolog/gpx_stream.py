@@ -0,0 +1,247 @@
+from functools import lru_cache
+from typing import Iterator, NamedTuple
+from xml.parsers import expat
+from xml.sax.saxutils import quoteattr
+
+import numpy as np
+from pyproj import Transformer
+
+from reverse_geocoder import OUTSIDE
+
+# Number of track points in one yielded chunk
+CHUNK_SIZE = 50_000
+# Number of bytes read from the file at once
+READ_BLOCK = 1 << 20
+
+# Elements opened before the first track point when the parsing starts in the middle of a file,
+# {} is replaced by the namespace declarations of the file
+RESUME_PREFIX = "<gpx{}><trk><trkseg>"
+
+# Matching modes of first_visits - track points or line segments between them
+MODE_POINTS = "points"
+MODE_SEGMENTS = "segments"
+
+
+class GpxChunk(NamedTuple):
+    """
+    A chunk of consecutive track points.
+
+    lon, lat - WGS 84 coordinates (float64)
+    time - time of the point (datetime64[s], NaT if the point has no time)
+    segment - running number of the track segment the point belongs to
+    """
+    lon: np.ndarray
+    lat: np.ndarray
+    time: np.ndarray
+    segment: np.ndarray
+
+
+@lru_cache(maxsize=None)
+def get_transformer():
+    """
+    Return the (cached) transformer from WGS 84 to S-JTSK.
+    Call transform(lat, lon), the result is (x, y) in EPSG:5514.
+    """
+    return Transformer.from_crs("EPSG:4326", "EPSG:5514")
+
+
+def _local_name(name):
+    # expat reports namespaced tags as "<namespace uri> <tag>"
+    return name.rpartition(" ")[2]
+
+
+class _FirstPoint(Exception):
+    """
+    Stops parsing the beginning of a file at its first track point.
+    """
+
+
+def _resume_prefix(file):
+    """
+    Return RESUME_PREFIX with all namespace declarations made before the first track point of the file
+    (e.g. xmlns:gpxtpx of the Garmin extensions), so that the prefixed elements of the points can be parsed.
+    The file is read from its beginning, its position is not restored.
+    """
+    declarations = {}
+
+    def start_namespace(prefix, uri):
+        declarations.setdefault(prefix, uri)
+
+    def start_element(name, attrs):
+        if _local_name(name) == "trkpt":
+            raise _FirstPoint
+
+    parser = expat.ParserCreate(namespace_separator=" ")
+    parser.StartNamespaceDeclHandler = start_namespace
+    parser.StartElementHandler = start_element
+    file.seek(0)
+    try:
+        while True:
+            block = file.read(READ_BLOCK)
+            parser.Parse(block, not block)
+            if not block:
+                break
+    except _FirstPoint:
+        pass
+    attributes = "".join(f" xmlns:{prefix}={quoteattr(uri)}" if prefix else f" xmlns={quoteattr(uri)}"
+                         for prefix, uri in declarations.items())
+    return RESUME_PREFIX.format(attributes).encode("utf-8")
+
+
+def iter_gpx_chunks(path, chunk_size=CHUNK_SIZE, start=0, position=None) -> Iterator[GpxChunk]:
+    """
+    Read the track points of the GPX file incrementally.
+
+    The file is fed to the expat parser block by block and the points are yielded
+    in chunks of NumPy arrays, so the memory used does not depend on the file size.
+
+    Parameters:
+    path (str): The path to the GPX file.
+    chunk_size (int): Maximal number of points in one chunk.
+    start (int): Byte offset of the <trkpt> element to start at, 0 for the whole file.
+    position (dict): If given, updated with "points" - the number of track points read and
+                     "last_point" - the byte offset of the last <trkpt> element (None without points),
+                     the start for reading the points appended to the file later.
+
+    Returns:
+    Iterator[GpxChunk]: Chunks of track points in the order of the file.
+
+    Raises:
+    xml.parsers.expat.ExpatError: If the file is not a valid XML file.
+    """
+    lons, lats, times, segments = [], [], [], []
+    state = {"segment": -1, "in_point": False, "in_time": False, "time": ""}
+    if position is None:
+        position = {}
+    position.update(points=0, last_point=None)
+    # offset of the first byte fed to the parser in the file
+    base = 0
+
+    def start_element(name, attrs):
+        tag = _local_name(name)
+        if tag == "trkseg":
+            state["segment"] += 1
+        elif tag == "trkpt":
+            state["in_point"] = True
+            state["time"] = ""
+            position["points"] += 1
+            position["last_point"] = base + parser.CurrentByteIndex
+            lats.append(float(attrs["lat"]))
+            lons.append(float(attrs["lon"]))
+        elif tag == "time" and state["in_point"]:
+            state["in_time"] = True
+
+    def end_element(name):
+        tag = _local_name(name)
+        if tag == "time":
+            state["in_time"] = False
+        elif tag == "trkpt" and state["in_point"]:
+            state["in_point"] = False
+            # the date and time part only, time zone designator is dropped
+            times.append(state["time"].strip()[0:19] or "NaT")
+            segments.append(state["segment"])
+
+    def char_data(data):
+        if state["in_time"]:
+            state["time"] += data
+
+    parser = expat.ParserCreate(namespace_separator=" ")
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    parser.CharacterDataHandler = char_data
+
+    def make_chunk(count):
+        chunk = GpxChunk(np.array(lons[:count], dtype=np.float64),
+                         np.array(lats[:count], dtype=np.float64),
+                         np.array(times[:count], dtype="datetime64[s]"),
+                         np.array(segments[:count], dtype=np.int64))
+        del lons[:count], lats[:count], times[:count], segments[:count]
+        return chunk
+
+    with open(path, "rb") as file:
+        if start:
+            # the points in the middle of the file are wrapped in the elements cut off before them
+            prefix = _resume_prefix(file)
+            base = start - len(prefix)
+            file.seek(start)
+            parser.Parse(prefix, False)
+        while True:
+            block = file.read(READ_BLOCK)
+            parser.Parse(block, not block)
+            while len(segments) >= chunk_size:
+                yield make_chunk(chunk_size)
+            if not block:
+                break
+
+    if segments:
+        yield make_chunk(len(segments))
+
+
+def add_first_visits(visits, kody, times):
+    """
+    Add obce not yet in visits with the time of their first occurence.
+    kody and times have to be in the order of visiting.
+    """
+    # position index of the first occurence of each obec
+    unique_kody, occurences = np.unique(kody, return_index=True)
+    for idx in np.argsort(occurences):
+        kod = int(unique_kody[idx])
+        if kod == OUTSIDE or kod in visits:
+            continue
+        time = times[occurences[idx]]
+        visits[kod] = None if np.isnat(time) else str(time)[0:10]
+
+
+def merge_first_visits(visits, new_visits):
+    """
+    Merge other first visits (e.g. of another file) into visits, the earlier date of an obec is kept.
+    A visit without a date (track without times) is replaced by a dated one.
+    """
+    for obec_id, date in new_visits.items():
+        current = visits.get(obec_id, date)
+        if current is None or (date is not None and date < current):
+            current = date
+        visits[obec_id] = current
+
+
+def first_visits(path, geocoder, mode=MODE_POINTS, chunk_size=CHUNK_SIZE, start=0, position=None,
+                 on_chunk=None) -> dict:
+    """
+    Find all obce visited by the GPX track with the date of the first visit.
+
+    Every chunk of the file is transformed to S-JTSK and assigned to obce by the
+    reverse geocoder, only the first occurence of each obec is kept.
+
+    Parameters:
+    path (str): The path to the GPX file.
+    geocoder (ReverseGeocoder): The spatial index of obce.
+    mode (str): MODE_POINTS to match the track points, MODE_SEGMENTS to match the lines
+                between them (finds also obce crossed between two sparse points).
+    chunk_size (int): Number of points processed at once.
+    start (int): Byte offset of the <trkpt> element to start at, see iter_gpx_chunks.
+    position (dict): Updated with the number of points read and the offset of the last one, see iter_gpx_chunks.
+    on_chunk (callable): Called with (x, y, time, segment) of every chunk in S-JTSK, e.g. to archive the track.
+
+    Returns:
+    dict: {kod_obce (int): date of the first visit (str yyyy-mm-dd or None)} in the order of visiting.
+    """
+    transformer = get_transformer()
+    visits = {}
+    previous = None
+    for chunk in iter_gpx_chunks(path, chunk_size, start, position):
+        x, y = transformer.transform(chunk.lat, chunk.lon)
+        if on_chunk is not None:
+            on_chunk(x, y, chunk.time, chunk.segment)
+
+        if mode == MODE_SEGMENTS:
+            time, segment = chunk.time, chunk.segment
+            # connect the segment split between two chunks with the last point of the previous chunk
+            if previous is not None and previous[3] == segment[0]:
+                x, y, time, segment = (np.concatenate(([p], a)) for p, a in zip(previous, (x, y, time, segment)))
+            previous = (x[-1], y[-1], time[-1], segment[-1])
+            kody, times = geocoder.crossings(x, y, time, segment)
+        else:
+            kody, times = geocoder.lookup(x, y), chunk.time
+
+        add_first_visits(visits, kody, times)
+    return visits
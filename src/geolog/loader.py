@@ -0,0 +1,115 @@
+import queue
+import threading
+
+# How often (ms) the Tk main loop checks the worker thread for progress and results
+POLL_INTERVAL = 50
+
+
+class LoadCancelled(Exception):
+    """
+    Raised inside the work function when the task was cancelled.
+    """
+
+
+class BackgroundTask:
+    """
+    Runs a long function (reading geodata, building indexes) on a worker thread.
+
+    The Tk main loop stays responsive - the worker only puts messages to a queue which is
+    polled with root.after, so all callbacks (on_progress, on_done, on_error, on_cancel)
+    are called in the Tk thread and can safely touch the widgets.
+
+    The work function gets the task as its only argument and reports its progress with
+    task.progress(fraction, message), which raises LoadCancelled once cancel() was called.
+    """
+
+    def __init__(self, root, work, on_done, on_progress=None, on_error=None, on_cancel=None):
+        """
+        Parameters:
+        root (tkinter.Tk): The root Tkinter window whose main loop polls the task.
+        work (callable): work(task) returns the result, runs on the worker thread.
+        on_done (callable): on_done(result) called with the result of work.
+        on_progress (callable): on_progress(fraction, message) called with the last reported progress.
+        on_error (callable): on_error(exception) called when work raises an exception.
+        on_cancel (callable): on_cancel() called when work stopped after cancel().
+        """
+        self.root = root
+        self.work = work
+        self.on_done = on_done
+        self.on_progress = on_progress
+        self.on_error = on_error
+        self.on_cancel = on_cancel
+        self._messages = queue.Queue()
+        self._cancelled = threading.Event()
+        # daemon thread does not keep the app alive when the user closes it during loading
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        """
+        Start the work on the worker thread and the polling in the Tk main loop.
+        """
+        self._thread.start()
+        self.root.after(POLL_INTERVAL, self._poll)
+
+    def cancel(self):
+        """
+        Ask the work to stop at its next progress report.
+        """
+        self._cancelled.set()
+
+    def running(self):
+        """
+        Return True while the work has not finished yet.
+        """
+        return self._thread.is_alive()
+
+    def progress(self, fraction, message=""):
+        """
+        Report the progress of the work. Called from the worker thread.
+
+        Parameters:
+        fraction (float): The finished part of the work (0-1).
+        message (str): Description of the current step.
+
+        Raises:
+        LoadCancelled: If the task was cancelled.
+        """
+        if self._cancelled.is_set():
+            raise LoadCancelled()
+        self._messages.put(("progress", (fraction, message)))
+
+    def _run(self):
+        try:
+            result = self.work(self)
+        except LoadCancelled:
+            self._messages.put(("cancel", None))
+        except Exception as e:
+            self._messages.put(("error", e))
+        else:
+            self._messages.put(("done", result))
+
+    def _poll(self):
+        last_progress = None
+        while True:
+            try:
+                kind, value = self._messages.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "progress":
+                # only the latest progress is shown
+                last_progress = value
+                continue
+            if kind == "done":
+                self.on_done(value)
+            elif kind == "error":
+                if self.on_error is None:
+                    raise value
+                self.on_error(value)
+            elif self.on_cancel is not None:
+                self.on_cancel()
+            return
+
+        if last_progress is not None and self.on_progress is not None:
+            self.on_progress(*last_progress)
+        self.root.after(POLL_INTERVAL, self._poll)
@@ -1,22 +1,31 @@
-import itertools
+from functools import partial
 import sys
+from typing import NamedTuple
 import tkinter as tk
 from tkinter import Toplevel, Label, ttk
-import geopandas as gpd
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from screeninfo import get_monitors
-import sqlite3
 import os
 from tkcalendar import DateEntry
 import locale
 import warnings
 from tkinter import filedialog as fd
-import gpxpy
-from pyproj import Transformer
-from shapely.geometry import Point
 from PIL import Image, ImageTk
-from tkinter import Frame, Canvas, Scrollbar
+from geo_store import GeoDataStore, KRAJ_COLUMNS, OKRES_COLUMNS, KRAJE_PATH, OKRESY_PATH, OBCE_PATH, lod_tolerances
+from reverse_geocoder import ReverseGeocoder
+from map_view import MapView
+from loader import BackgroundTask
+from visit_store import VisitStore, COVERAGE_STAT, COVERAGE_KRAJ, COVERAGE_OKRES, COUNTRY
+from stats_engine import CoverageStats
+from stats_dashboard import PieDashboard
+from topology import LEVEL_OBEC, LEVEL_OKRES, LEVEL_KRAJ
+from windows import DialogManager
+from admin_index import AdminIndex
+from obec_search import ObecSearch
+from batch_import import cli as import_cli
+from gpx_stream import MODE_POINTS, MODE_SEGMENTS
+from gpx_ledger import import_gpx
+from track_archive import TrackArchive
+from xml.parsers.expat import ExpatError
 
 # Loading time is quite long while reploting, so I added a loading screen
 # matplotlib might not be ideal for showing spatial data, but it works
@@ -80,15 +89,16 @@ def get_screen_resolution() -> tuple[int, int] | tuple[None, None]:
         return None, None
 
 
-def loading_screen(root):
+def loading_screen(root, on_cancel):
     """
-    Creates a loading screen.
+    Creates a loading screen with a progress bar and a button to cancel the loading.
 
     Parameters:
     root (tkinter.Tk): The root Tkinter window.
+    on_cancel (callable): Called when the user cancels the loading.
 
     Returns:
-    tkinter.Toplevel: The loading window.
+    tuple: (tkinter.Toplevel, callable) - the loading window and show_progress(fraction, message).
     """
     loading_window = Toplevel(root)
     loading_window.title("NAČÍTÁNÍ...")
@@ -107,155 +117,116 @@ def loading_screen(root):
     label_small = Label(loading_window, text="Dejte si kávičku, za chvíli bude hotovo :)", font=custom_font_small)
     label_small.pack(pady=(screen_height / 1080) * 10)
 
-    return loading_window
+    # Progress of the data loading running in the background
+    progress_bar = ttk.Progressbar(loading_window, mode="determinate", maximum=100, length=400)
+    progress_bar.pack()
+    label_progress = Label(loading_window, text="", font=("Raleway", 10))
+    label_progress.pack()
 
+    button_cancel = ttk.Button(loading_window, text="Zrušit", command=on_cancel)
+    button_cancel.pack(pady=(screen_height / 1080) * 5)
+    loading_window.protocol("WM_DELETE_WINDOW", on_cancel)
 
-def plot_geopackage(root, gpkg_paths, loading_window):
-    """
-    Plot Shapefile files on a Matplotlib figure embedded in a Tkinter window.
+    def show_progress(fraction, message):
+        progress_bar['value'] = fraction * 100
+        label_progress.config(text=message)
 
-    Parameters:
-    root (tkinter.Tk): The root Tkinter window.
-    gpkg_paths (list): A list of tuples containing the Shapefile file paths and their corresponding colors.
-    loading_window (tkinter.Toplevel): The loading window to be destroyed before plotting.
+    return loading_window, show_progress
 
-    If global variable REplot is set to 1, then the function will plot visited obce in database.
 
-    Returns:
-    None
+class LoadedGeodata(NamedTuple):
     """
-    global REplot
-    global obce_gdf
-
-    # Create a Matplotlib figure and axis
-    fig, ax = plt.subplots()
-    # Hide the axis
-    ax.set_axis_off()
-    global canvas_widget
-
-    # Plot visited obce
-    if REplot == 1:
-        canvas_widget.pack_forget()
-        canvas_widget.destroy()
-
-        # I didn't find a way to plot above existing plot, so I just plot everything again :(
-        for gpkg_path, color in gpkg_paths:
-            gdf = gpd.read_file(gpkg_path)
-            gdf.boundary.plot(ax=ax, color=color)
-
-        obecIDs = cursor.execute("SELECT obecID FROM " + user)
-        obecIDs = obecIDs.fetchall()
-        obecIDs = [int(item[0]) for item in obecIDs]
+    Everything built from the layers by load_geodata, used by the app once the loading is finished.
 
-        matching_obce = obce_gdf[obce_gdf['kod_obce'].isin(obecIDs)]
-        matching_obce.plot(ax=ax, color='red')
-
-        canvas = FigureCanvasTkAgg(fig, master=root)
-        canvas_widget = canvas.get_tk_widget()
-        canvas_widget.pack(side=tk.TOP, fill=tk.BOTH, expand=1)
-
-        # Update the canvas after both plots
-        canvas.draw()
-        root.update()
-        loading_window.destroy()
-
-    else:
-        for gpkg_path, color in gpkg_paths:
-            # Read GeoPackage file using GeoPandas
-            gdf = gpd.read_file(gpkg_path)
+    geocoder - the spatial index of obce (reverse_geocoder.ReverseGeocoder)
+    coverage_stats - the region codes of obce for the coverage counters (stats_engine.CoverageStats)
+    admin_index - kraj -> okres -> obec lookups of the comboboxes (admin_index.AdminIndex)
+    obec_search - the names of obce for the search box (obec_search.ObecSearch)
+    gazetteer - rows (kod_obce, nazev_obce, nazev_okre, nazev_kraj) of all obce for the date filter
+    """
+    geocoder: ReverseGeocoder
+    coverage_stats: CoverageStats
+    admin_index: AdminIndex
+    obec_search: ObecSearch
+    gazetteer: list
 
-            # Plot only the borders of the GeoDataFrame on Matplotlib axis and color them
-            gdf.boundary.plot(ax=ax, color=color)
 
-        # Create a FigureCanvasTkAgg
-        canvas = FigureCanvasTkAgg(fig, master=root)
-        canvas_widget = canvas.get_tk_widget()
-        canvas_widget.pack(side=tk.TOP, fill=tk.BOTH, expand=1)
+def load_geodata(task):
+    """
+    Read the layers and prepare everything the map, the statistics, the search and the GPX import need.
+    Runs on the worker thread of the loading task, the Tk main loop stays responsive.
 
-        # Update the canvas after both plots
-        canvas.draw()
-        root.update()
+    Parameters:
+    task (loader.BackgroundTask): The task used to report progress (and to stop when cancelled).
 
-        # Destroy the loading window once the shapefiles are loaded
-        loading_window.destroy()
+    Returns:
+    LoadedGeodata: The indexes built from the layers.
+    """
+    steps = [
+        ("Načítání krajů", partial(geo_store.layer, KRAJE_PATH)),
+        ("Načítání okresů", partial(geo_store.layer, OKRESY_PATH)),
+        ("Načítání obcí", partial(geo_store.layer, OBCE_PATH)),
+    ]
+    # Borders of every level of detail, the coarsest (whole ČR) is shown first
+    for tolerance in sorted(lod_tolerances(), reverse=True):
+        steps.append((f"Příprava hranic ({tolerance:g} m)", partial(geo_store.arcs, tolerance)))
+
+    for idx, (message, step) in enumerate(steps):
+        task.progress(idx / (len(steps) + 2), message)
+        step()
+
+    task.progress(len(steps) / (len(steps) + 2), "Prostorový index obcí")
+    obce = geo_store.layer(OBCE_PATH)
+    okresy = geo_store.layer(OKRESY_PATH)
+    geocoder = ReverseGeocoder(obce)
+
+    task.progress((len(steps) + 1) / (len(steps) + 2), "Seznamy obcí")
+    # kraj -> okres -> obec lookups for the cascading comboboxes and the obce names for the search box
+    okresy_in_kraje = okresy[[KRAJ_COLUMNS[OKRESY_PATH], OKRES_COLUMNS[OKRESY_PATH]]]
+    obce_in_okresy = list(obce[['nazev_okre', 'nazev_obce', 'kod_obce']].itertuples(index=False))
+    gazetteer = obce[['kod_obce', 'nazev_obce', 'nazev_okre', 'nazev_kraj']].drop_duplicates('kod_obce')
+    return LoadedGeodata(geocoder,
+                         CoverageStats(obce, KRAJ_COLUMNS[OBCE_PATH], OKRES_COLUMNS[OBCE_PATH]),
+                         AdminIndex(okresy_in_kraje.itertuples(index=False), obce_in_okresy),
+                         ObecSearch(obce_in_okresy),
+                         list(gazetteer.itertuples(index=False)))
+
+
+def visited_obecIDs():
+    """
+    Returns the obecIDs of obce visited by the current user.
+    """
+    return visit_store.visited_ids(user)
 
 
-def plot_geopackage_selection(root, gpkg_paths, loading_window, selected_nazev=None):
+def plot_geopackage(root, gpkg_paths, loading_window):
     """
-    Plot Shapefile files on a Matplotlib figure embedded in a Tkinter window.
-    Plots only selected kraj, coresponding okreses and obce_generalized.shp
-    If global variable REplot is set to 1, then the function will plot visited obce in database.
+    Plot Shapefile files on the Matplotlib map embedded in a Tkinter window.
+    The whole map is prepared only once, zooming to kraj/okres only changes the view of it.
 
     Parameters:
     root (tkinter.Tk): The root Tkinter window.
     gpkg_paths (list): A list of tuples containing the Shapefile file paths and their corresponding colors.
-    loading_window (tkinter.Toplevel): The loading window to be destroyed before plotting.
-    selected_nazev (str): The selected nazev from the combobox.
+    loading_window (tkinter.Toplevel): The loading window to be destroyed after plotting.
+
+    If global variable REplot is set to 1, then the function will plot visited obce in database.
 
     Returns:
     None
     """
+    # Plot only the borders, each border shared by obce, okresy and kraje is drawn once in the color
+    # of its highest level, simplified for the whole country or a kraj (level-of-detail pyramid)
+    colors = dict(gpkg_paths)
+    level_colors = {LEVEL_KRAJ: colors[KRAJE_PATH], LEVEL_OKRES: colors[OKRESY_PATH], LEVEL_OBEC: colors[OBCE_PATH]}
+    map_view.prepare(geo_store.arcs, level_colors, geo_store.layer(OBCE_PATH), KRAJ_COLUMNS[OBCE_PATH],
+                     OKRES_COLUMNS[OBCE_PATH], partial(geo_store.geometries, OBCE_PATH), lod_tolerances())
 
-    # Create a Matplotlib figure and axis
-    loading_window = loading_screen(root)
-    global canvas_widget
-    canvas_widget.pack_forget()
-    canvas_widget.destroy()
-    root.update()
-    global obce_gdf
-
-    fig, ax = plt.subplots()
-
-    # Read GeoPackage files and store them in a dictionary
-    gpkg_data = {}
-    column_mapping = {
-        "geodata/kraje.shp": "nazev",
-        "geodata/okresy.shp": "Název_kra",
-        "geodata/obce_generalized.shp": "nazev_kraj"
-    }
-    # Get the necessary GeoPackage files based on the selected region
-    necessary_gpkg_paths = []
-    for gpkg_path, color in gpkg_paths:
-        if gpkg_path in column_mapping:
-            necessary_gpkg_paths.append((gpkg_path, color))
-
-    for gpkg_path, color in necessary_gpkg_paths:
-        gpkg_data[gpkg_path] = gpd.read_file(gpkg_path)
-
-    # Dictionary mapping shapefile paths to the corresponding column names for filtering
-
-    for gpkg_path, color in necessary_gpkg_paths:
-        gdf = gpkg_data[gpkg_path]
-
-        # Check if the shapefile path is in the column_mapping dictionary
-        if gpkg_path in column_mapping:
-            column_name = column_mapping[gpkg_path]
-
-            # Check if the column exists in the GeoDataFrame
-            if column_name in gdf.columns:
-                # Filter GeoDataFrame based on the selected value in the corresponding column
-                if selected_nazev is not None:
-                    gdf = gdf[gdf[column_name] == selected_nazev]
-
-                # Plot only the borders of the GeoDataFrame on Matplotlib axis and color them
-                gdf.boundary.plot(ax=ax, color=color)
-
-                # Plot visited obce
-                if REplot == 1:
-                    obecIDs = cursor.execute("SELECT obecID FROM " + user)
-                    obecIDs = obecIDs.fetchall()
-                    obecIDs = [int(item[0]) for item in obecIDs]
-
-                    matching_obce = obce_gdf[
-                        ((obce_gdf['nazev_kraj'] == selected_nazev) & obce_gdf['kod_obce'].isin(obecIDs))]
-                    matching_obce.plot(ax=ax, color='red')
-
-    ax.set_axis_off()
-
-    canvas = FigureCanvasTkAgg(fig, master=root)
-    canvas_widget = canvas.get_tk_widget()
-    canvas_widget.pack(side=tk.TOP, fill=tk.BOTH, expand=1)
+    # Plot visited obce
+    if REplot == 1:
+        map_view.set_visited(visited_obecIDs())
 
+    root.update()
+    # Destroy the loading window once the map is drawn
     loading_window.destroy()
 
 
@@ -270,17 +241,19 @@ def main():
     root.iconbitmap("files/ico.ico")
 
     root.update()
+    # All other windows are Toplevels of root sharing its Tcl interpreter and the theme
+    dialogs = DialogManager(root)
 
     def quit_app():
         """
         Quit the application upon clicking on X.
         """
-        cursor.close()
+        visit_store.close()
         root.quit()
         root2.quit()
         sys.exit()
 
-    # Declare roots as a global variables so that they can be destroyed later
+    # Declare roots as a global variables, the dialogs are created once and then only hidden and shown again
     global root3
     root3 = None
     global adduserpanelroot
@@ -294,8 +267,6 @@ def main():
     global stopar_root
     stopar_root = None
     global REplot
-    global obce_gdf
-    obce_gdf = None
     REplot = 0
     global stoparFILE
     stoparFILE = None
@@ -313,8 +284,12 @@ def main():
     global user_to_remove
     global combo_var_okresyADD
     global combo_var_krajeADD
-    global conn
-    global cursor
+    global visit_store
+    global geo_store
+    global admin_index
+    global obec_search
+    global obce_geocoder
+    global map_view
     combo_var_krajeADD = tk.StringVar()
     combo_var_okresyADD = tk.StringVar()
     combo_var_REMuser = tk.StringVar()
@@ -322,36 +297,31 @@ def main():
     user = "---"
     # Connect to the SQLite database
     DB_directory = 'database'
-    conn = sqlite3.connect(os.path.join(DB_directory, 'users.db'))
-    cursor = conn.cursor()
+    visit_store = VisitStore(os.path.join(DB_directory, 'users.db'))
 
     # Specify the paths to your Shapefile files and their corresponding colors
-    kraje_shp_path = "geodata/kraje.shp"
-    okresy_shp_path = "geodata/okresy.shp"
-    obce_shp_path = "geodata/obce_generalized.shp"
+    kraje_shp_path = KRAJE_PATH
+    okresy_shp_path = OKRESY_PATH
+    obce_shp_path = OBCE_PATH
 
     gpkg_paths = [
         (kraje_shp_path, 'blue'),
         (okresy_shp_path, 'green'),
         (obce_shp_path, 'gray')
     ]
-    # gpkg_paths_no_kraje is used for plot_geopackage_selection_okr
-    gpkg_paths_no_kraje = [
-        (okresy_shp_path, 'green'),
-        (obce_shp_path, 'gray')
-    ]
 
-    # Read GeoPackage file using GeoPandas
-    kraje_shp = gpd.read_file(kraje_shp_path)
-    okresy_shp = gpd.read_file(okresy_shp_path)
-    obce_shp = gpd.read_file(obce_shp_path)
-    obce_gdf = obce_shp
-    # Display loading screen
-    loading_window = loading_screen(root)
-    root.update()
+    # Read every Shapefile once, all redraws are served from the geodata store.
+    # The layers and the spatial index for assigning GPX points to obce are loaded
+    # in the background, until then they are None and the buttons using them are disabled
+    geo_store = GeoDataStore()
+    admin_index = None
+    obec_search = None
+    kraje_shp = None
+    okresy_shp = None
+    obce_shp = None
+    obce_geocoder = None
 
-    # Plot "kraje.shp" first and then overlay "okresy.shp" on top
-    plot_geopackage(root, gpkg_paths[::-1], loading_window)
+    map_view = MapView(root)
 
     ######################### SETTINGS PANEL #########################
     root2 = tk.Toplevel(root)
@@ -363,9 +333,6 @@ def main():
     else:
         root2.geometry(f"{(int(screen_width * 0.25))}x{(int(screen_height * 0.7))}")
     root2.title("GeoLog - nastavení")
-    # using predefined theme - https://github.com/rdbende/Azure-ttk-theme/
-    root2.tk.call("source", "files/azure.tcl")
-    root2.tk.call("set_theme", "light")
     root2.iconbitmap("files/ico.ico")
     root2.resizable(False, False)
 
@@ -377,16 +344,10 @@ def main():
     combo_var_kraje = tk.StringVar(root2)
     combo_var_kraje.set("--vyber kraj--")  # Default text in the combobox
 
-    # Get the list of kraje names from shapefile
-    kraje_nazvy = kraje_shp['nazev'].unique()
-    kraje_nazvy = ['Celá ČR'] + list(kraje_nazvy)
-
-    # Enclose each 'nazev' value in double quotes
-    quoted_kraje_nazvy = ['{}'.format(nazev) for nazev in kraje_nazvy]
-    # Create a combobox with the list of  kraje names
-    combo_box_kraje = ttk.Combobox(root2, textvariable=combo_var_kraje, values=quoted_kraje_nazvy)
+    # Create a combobox for the kraje names, it is filled once the geodata are loaded
+    combo_box_kraje = ttk.Combobox(root2, textvariable=combo_var_kraje, values=[])
     combo_box_kraje.pack(pady=(screen_height / 1080) * 20)
-    combo_box_kraje['state'] = 'readonly'
+    combo_box_kraje['state'] = 'disabled'
 
     # okresy selection (initially hidden)
     label = Label(root2, text="Přibliž na okres:", font=desc_font)
@@ -417,12 +378,8 @@ def main():
 
         # Check if "Celá ČR" is selected
         if selected_nazev_kraj == "Celá ČR":
-            # Destroy previous canvas widget
-            for widget in root.winfo_children():
-                if isinstance(widget, tk.Widget):
-                    widget.destroy()
-            plot_geopackage(root, gpkg_paths[::-1], loading_window)
-            root.update()
+            # Zoom out to the whole map
+            map_view.zoom(None)
 
             # Disable and reset the second combobox
             combo_box_okresy.set("--vyber okres--")
@@ -435,94 +392,12 @@ def main():
             combo_box_okresy['state'] = 'readonly'
 
             # Continue with the previous logic for other selections
-            for widget in root.winfo_children():
-                if isinstance(widget, tk.Widget):
-                    widget.destroy()
-            okresy_nazvy = list(okresy_shp[okresy_shp['Název_kra'] == selected_nazev_kraj]['Název_okr'])
+            okresy_nazvy = admin_index.okresy(selected_nazev_kraj)
 
-            plot_geopackage_selection(root, gpkg_paths_no_kraje[::-1], loading_window, selected_nazev_kraj)
+            # Zoom to the selected kraj, everything outside of it is dimmed
+            map_view.zoom(geo_store.kraj_bounds(selected_nazev_kraj), kraj=selected_nazev_kraj)
             combo_box_okresy['values'] = okresy_nazvy
             combo_box_okresy.set('--vyber okres--')  # Reset the selection
-            root.update()
-
-    def plot_geopackage_selection_okr(root, gpkg_paths, loading_window, selected_nazev=None):
-        """
-        Plot GeoPackage files on a Matplotlib figure embedded in a Tkinter window.
-        This modification only choses okresy.shp selected border and obce_generalized.shp
-        Kraje are not plotted
-
-        If global variable REplot is set to 1, then the function will plot visited obce in database.
-
-        Parameters:
-        root (tkinter.Tk): The root Tkinter window.
-        gpkg_paths (list): A list of tuples containing the GeoPackage file paths and their corresponding colors.
-        loading_window (tkinter.Toplevel): The loading window to be destroyed before plotting.
-        selected_nazev (str): The selected nazev from the combobox.
-
-        Returns:
-        None
-        """
-        global canvas_widget
-        global obce_gdf
-        # Create a Matplotlib figure and axis
-        loading_window = loading_screen(root)
-        canvas_widget.pack_forget()
-        canvas_widget.destroy()
-        root.update()
-
-        fig, ax = plt.subplots()
-
-        # Read Shapefile files and store them in a dictionary
-        gpkg_data = {}
-        column_mapping = {
-            "geodata/okresy.shp": "Název_okr",
-            "geodata/obce_generalized.shp": "nazev_okre"
-        }
-        # Get the necessary Shapefile files based on the selected region
-        necessary_gpkg_paths = []
-        for gpkg_path, color in gpkg_paths:
-            if gpkg_path in column_mapping:
-                necessary_gpkg_paths.append((gpkg_path, color))
-
-        for gpkg_path, color in necessary_gpkg_paths:
-            gpkg_data[gpkg_path] = gpd.read_file(gpkg_path)
-
-        # Dictionary mapping shapefile paths to the corresponding column names for filtering
-
-        for gpkg_path, color in necessary_gpkg_paths:
-            gdf = gpkg_data[gpkg_path]
-
-            # Check if the shapefile path is in the column_mapping dictionary
-            if gpkg_path in column_mapping:
-                column_name = column_mapping[gpkg_path]
-
-                # Check if the column exists in the GeoDataFrame
-                if column_name in gdf.columns:
-                    # Filter GeoDataFrame based on the selected value in the corresponding column
-                    if selected_nazev is not None:
-                        gdf = gdf[gdf[column_name] == selected_nazev]
-
-                    # Plot only the borders of the GeoDataFrame on Matplotlib axis and color them
-                    gdf.boundary.plot(ax=ax, color=color)
-
-                    # Plot visited obce in database based on the selected value in the combobox (current zoom)
-                    if REplot == 1:
-                        obecIDs = cursor.execute("SELECT obecID FROM " + user)
-                        obecIDs = obecIDs.fetchall()
-                        obecIDs = [int(item[0]) for item in obecIDs]
-
-                        matching_obce = obce_gdf[
-                            ((obce_gdf['nazev_okre'] == selected_nazev) & obce_gdf['kod_obce'].isin(obecIDs))]
-                        matching_obce.plot(ax=ax, color='red')
-
-        ax.set_axis_off()
-
-        # Create a FigureCanvasTkAgg to plot on
-        canvas = FigureCanvasTkAgg(fig, master=root)
-        canvas_widget = canvas.get_tk_widget()
-        canvas_widget.pack(side=tk.TOP, fill=tk.BOTH, expand=1)
-
-        loading_window.destroy()
 
     def update_plot_okres(event):
         """
@@ -533,12 +408,8 @@ def main():
 
         selected_nazev_okres = combo_var_okresy.get()
 
-        # Plot okres and obce
-        for widget in root.winfo_children():
-            if isinstance(widget, tk.Widget):
-                widget.destroy()
-        plot_geopackage_selection_okr(root, gpkg_paths_no_kraje[::-1], loading_window, selected_nazev_okres)
-        root.update()
+        # Zoom to the selected okres, everything outside of it is dimmed
+        map_view.zoom(geo_store.okres_bounds(selected_nazev_okres), okres=selected_nazev_okres)
 
     # Bind the event to update_plot function for kraje/okresy combobox
     combo_box_kraje.bind("<<ComboboxSelected>>", update_plot)
@@ -547,90 +418,70 @@ def main():
 
     def re_plot():
         """
-        Replot the map with visited obce in database based on the selected value in the combobox (current zoom).
-        set REplot to 1 to change functionality of
-        plot_geopackage/plot_geopackage_selection/plot_geopackage_selection_okr .
+        Recolor visited obce in database on the map in the current zoom.
+        REplot set to 1 colors visited obce of the user, REplot set to 0 clears them.
 
+        Only face colors of the visited obce collection are changed, the map is not plotted again.
         This function is started after every change of user or after adding/removing obec.
         """
-        global REplot
-
-        loading_window = loading_screen(root)
-        root.update()
-        # get current zoom
-        kraj_select = combo_var_kraje.get()
-        okres_select = combo_var_okresy.get()
-
-        # plot visited obce in database based on the selected value in the combobox (current zoom)
-        if kraj_select == "--vyber kraj--" and okres_select == "--vyber okres--":
-            plot_geopackage(root, gpkg_paths[::-1], loading_window)
-
-        elif kraj_select != "--vyber kraj--" and okres_select == "--vyber okres--":
-            loading_window.destroy()
-            plot_geopackage_selection(root, gpkg_paths_no_kraje[::-1], loading_window, kraj_select)
-
-        elif kraj_select != "--vyber kraj--" and okres_select != "--vyber okres--":
-            loading_window.destroy()
-            plot_geopackage_selection_okr(root, gpkg_paths_no_kraje[::-1], loading_window, okres_select)
-
+        if REplot == 1:
+            map_view.set_visited(visited_obecIDs())
         else:
-            print("chyba pri prekresleni")
+            map_view.set_visited([])
+        refresh_statistics()
 
-        try:
-            loading_window.destroy()
-        except:
-            pass
+    def enable_user_buttons():
+        """
+        Enable buttons 1,2,3, Statistics and Date Selecton.
+        All of them need geodata, so they stay disabled until the loading is finished.
+        """
+        if obce_shp is None:
+            return
+        button1.config(state="normal")
+        button2.config(state="normal")
+        button3.config(state="normal")
+        buttonstat.config(state="normal")
+        buttondate.config(state="normal")
 
     def add_user():
         """
-        Create a new table in the database with the name of the user.
+        Create a new user in the database.
         global user is set to the name of the user.
         close the adduserpanelroot and root3 window.
         enable buttons 1,2,3
         """
         global user
         global entryuser
+        global labelusererr
 
         username = str(entryuser.get())
         # Check if username is empty
         if not username or ' ' in username:
             print("Neplatné jméno, nepoužívej mezery")
-            labelusererr = Label(adduserpanelroot, text="Neplatné jméno, nepoužívej mezery", font=desc_font, fg="red")
-            labelusererr.pack(pady=screen_height / 1080)
+            labelusererr.config(text="Neplatné jméno, nepoužívej mezery")
             return
 
         # Check if username contains only alphanumeric characters
         if not username.isalnum():
             print("Neplatné jméno, nepoužívej mezery")
-            labelusererr = Label(adduserpanelroot, text="Neplatné jméno, nepoužívej mezery", font=desc_font, fg="red")
-            labelusererr.pack(pady=screen_height / 1080)
+            labelusererr.config(text="Neplatné jméno, nepoužívej mezery")
             return
 
-        # Check if username already exists
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        existing_tables = cursor.fetchall()  # Returns a list of tables in the database = users
-        if (username,) in existing_tables:
+        # Create the user, fails if username already exists
+        if not visit_store.add_user(username):
             print("uzivatel uz existuje")
-            labelusererr = Label(adduserpanelroot, text="Uživatel již existuje", font=desc_font, fg="red")
-            labelusererr.pack(pady=screen_height / 1080)
+            labelusererr.config(text="Uživatel již existuje")
             return
 
         print("uzivatel vytvoren: " + username)
-        # Create a new table in the database with the name of the user
-        cursor.execute("CREATE TABLE IF NOT EXISTS " + username + "(id INTEGER PRIMARY KEY, obecID VARCHAR(6), "
-                                                                  "dat DATE)")
         user = username
         user_label.config(text="Uživatel:  " + user)
 
         # Enable buttons 1,2,3
-        button1.config(state="normal")
-        button2.config(state="normal")
-        button3.config(state="normal")
-        buttonstat.config(state="normal")
-        buttondate.config(state="normal")
+        enable_user_buttons()
 
-        root3.destroy()
-        adduserpanelroot.destroy()
+        dialogs.hide("users")
+        dialogs.hide("add_user")
 
         global REplot
         REplot = 1
@@ -642,20 +493,13 @@ def main():
         """
         global adduserpanelroot
         global entryuser
+        global labelusererr
 
-        # Check if root already exists and destroy it if it does remove it
-        if adduserpanelroot is not None:
-            try:
-                adduserpanelroot.destroy()
-            except:
-                pass
-        adduserpanelroot = tk.Tk()
-        adduserpanelroot.geometry(f"{(int(screen_width * 0.25))}x{(int(screen_height * 0.25))}")
-        adduserpanelroot.title("GeoLog - nový uživatel")
-        adduserpanelroot.tk.call("source", "files/azure.tcl")
-        adduserpanelroot.tk.call("set_theme", "light")
-        adduserpanelroot.iconbitmap("files/ico.ico")
-        adduserpanelroot.update()
+        # Show the window if it was already created
+        if dialogs.show("add_user") is not None:
+            return
+        adduserpanelroot = dialogs.create("add_user", "GeoLog - nový uživatel",
+                                          f"{(int(screen_width * 0.25))}x{(int(screen_height * 0.25))}")
 
         # Text
         labeluser = Label(adduserpanelroot, text="Vlož jméno nového uživatele:", font=desc_font)
@@ -671,8 +515,18 @@ def main():
                                    width=15)
         button_adduser.pack(padx=(screen_width / 1920) * 5)
 
-        adduserpanelroot.protocol("WM_DELETE_WINDOW",
-                                  adduserpanelroot.destroy)  # Destroy root3 when the user closes the window
+        # empty label to show errors
+        labelusererr = Label(adduserpanelroot, text="", font=desc_font, fg="red")
+        labelusererr.pack(pady=screen_height / 1080)
+
+        def clear_entry():
+            """
+            Clear the entered name and the error of the previous opening.
+            """
+            entryuser.delete(0, tk.END)
+            labelusererr.config(text="")
+
+        dialogs.on_show("add_user", clear_entry)
 
     def existing_user_selected(event):
         """
@@ -687,17 +541,13 @@ def main():
         print("uzivatel zmenen: " + user)
 
         # Enable buttons 1,2,3, Statistics and Date Selecton.
-        button1.config(state="normal")
-        button2.config(state="normal")
-        button3.config(state="normal")
-        buttonstat.config(state="normal")
-        buttondate.config(state="normal")
+        enable_user_buttons()
 
         REplot = 1
         re_plot()
         # Leave only Settings panel and map on the screen
         root2.update()
-        root3.destroy()
+        dialogs.hide("users")
 
     def removeuser():
         """
@@ -707,7 +557,8 @@ def main():
         global user
         global REplot
 
-        cursor.execute("DROP TABLE " + user_to_remove)
+        visit_store.remove_user(user_to_remove)
+        TrackArchive(user_to_remove).remove()
         print("uzivatel smazan: " + user_to_remove)
         user = "---"
         user_label.config(text="Uživatel:  " + user)
@@ -715,8 +566,8 @@ def main():
         REplot = 0
         re_plot()
 
-        root3.destroy()
-        removeuserpanelroot.destroy()
+        dialogs.hide("users")
+        dialogs.hide("remove_user")
 
         # Disable buttons 1,2,3, Statistics and Date Selecton.
         buttondate['state'] = 'disabled'
@@ -747,39 +598,37 @@ def main():
         global combo_var_REMuser
         global REplot
 
-        # Check if root already exists and destroy it if it does remove it
-        if removeuserpanelroot is not None:
-            try:
-                removeuserpanelroot.destroy()
-            except:
-                pass
+        # Show the window if it was already created, the users are filled again
+        if dialogs.show("remove_user") is not None:
+            return
         # Window creation
-        removeuserpanelroot = tk.Tk()
         if screen_width / screen_height > 1.6:
-            removeuserpanelroot.geometry(f"{(int(screen_width * 0.25))}x{(int(screen_height * 0.25))}")
+            geometry = f"{(int(screen_width * 0.25))}x{(int(screen_height * 0.25))}"
         else:
-            removeuserpanelroot.geometry(f"{(int(screen_width * 0.35))}x{(int(screen_height * 0.35))}")
-        removeuserpanelroot.title("GeoLog - vymaž uživatele")
-        removeuserpanelroot.tk.call("source", "files/azure.tcl")
-        removeuserpanelroot.tk.call("set_theme", "light")
-        removeuserpanelroot.iconbitmap("files/ico.ico")
-        removeuserpanelroot.update()
+            geometry = f"{(int(screen_width * 0.35))}x{(int(screen_height * 0.35))}"
+        removeuserpanelroot = dialogs.create("remove_user", "GeoLog - vymaž uživatele", geometry)
         # Text
         labeluser = Label(removeuserpanelroot, text="Vyber uživatele pro smazání:", font=desc_font)
         labeluser.pack(pady=screen_height / 1080)
 
         # Combobox
         combo_var_REMuser = tk.StringVar(removeuserpanelroot)
-        combo_var_REMuser.set("--vyber uživatele--")  # Default text in the combobox
 
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        rem_tables = cursor.fetchall()  # Returns a list of tables in the database = users
-
-        combo_box_REMuser = ttk.Combobox(removeuserpanelroot, textvariable=combo_var_REMuser, values=rem_tables)
+        combo_box_REMuser = ttk.Combobox(removeuserpanelroot, textvariable=combo_var_REMuser, values=[])
         combo_box_REMuser.pack(pady=(screen_height / 1080) * 20)
         combo_box_REMuser['state'] = 'readonly'
         combo_box_REMuser.bind("<<ComboboxSelected>>", update_REMuser_var)
 
+        def fill_users():
+            """
+            Fill the combobox with the users in the database.
+            """
+            combo_box_REMuser['values'] = visit_store.users()
+            combo_var_REMuser.set("--vyber uživatele--")  # Default text in the combobox
+
+        fill_users()
+        dialogs.on_show("remove_user", fill_users)
+
         # Text
         labeluser = Label(removeuserpanelroot, text="STISKNUTÍM TLAČÍTKA NÍŽE NEVRATNĚ \n SMAŽETE UŽIVATELSKÁ DATA",
                           font=desc_font)
@@ -793,9 +642,6 @@ def main():
                                       width=15)
         button_removeuser.pack(padx=(screen_width / 1920) * 5)
 
-        removeuserpanelroot.protocol("WM_DELETE_WINDOW", removeuserpanelroot.destroy)
-        # Destroy removeuserpanelroot when the user closes the window
-
     def userpanel():
         """
         Create a new window with a combobox to select a user.
@@ -803,21 +649,13 @@ def main():
         global root3
         global combo_var_user  # Add this line to declare combo_var_user as a global variable
 
-        # Check if root3 already exists and destroy it if it does remove it
-        if root3 is not None:
-            try:
-                root3.destroy()
-            except:
-                pass
+        # Show the window if it was already created, the users are filled again
+        if dialogs.show("users") is not None:
+            return
 
         # Root3 is the window with the combobox to select a user
-        root3 = tk.Tk()
-        root3.geometry(f"{(int(screen_width * 0.25))}x{(int(screen_height * 0.25))}")
-        root3.title("GeoLog - uživatelé")
-        root3.tk.call("source", "files/azure.tcl")
-        root3.tk.call("set_theme", "light")
-        root3.iconbitmap("files/ico.ico")
-        root3.update()
+        root3 = dialogs.create("users", "GeoLog - uživatelé",
+                               f"{(int(screen_width * 0.25))}x{(int(screen_height * 0.25))}")
 
         # Text
         labeluser = Label(root3, text="Vyber uživatele:", font=desc_font)
@@ -825,16 +663,22 @@ def main():
 
         # Combobox
         combo_var_user = tk.StringVar(root3)
-        combo_var_user.set("--vyber uživatele--")  # Default text in the combobox
-
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = cursor.fetchall()  # Returns a list of tables in the database = users
 
-        combo_box_user = ttk.Combobox(root3, textvariable=combo_var_user, values=tables)
+        combo_box_user = ttk.Combobox(root3, textvariable=combo_var_user, values=[])
         combo_box_user.pack(pady=(screen_height / 1080) * 20)
         combo_box_user['state'] = 'readonly'
         combo_box_user.bind("<<ComboboxSelected>>", existing_user_selected)  # Bind the event to update user
 
+        def fill_users():
+            """
+            Fill the combobox with the users in the database.
+            """
+            combo_box_user['values'] = visit_store.users()
+            combo_var_user.set("--vyber uživatele--")  # Default text in the combobox
+
+        fill_users()
+        dialogs.on_show("users", fill_users)
+
         # Buttons
         button_adduser = tk.Button(root3, text="Přidej uživatele", command=adduserpanel, bg="light green", padx=10,
                                    pady=(screen_height / 1080) * 5,
@@ -847,8 +691,6 @@ def main():
         button_adduser.pack(padx=(screen_width / 1920) * 5)
         button_removeuser.pack(padx=(screen_width / 1920) * 5)
 
-        root3.protocol("WM_DELETE_WINDOW", root3.destroy)  # Destroy root3 when the user closes the window
-
     # Separator between buttons
     separator = ttk.Separator(root2, orient="horizontal")
     separator.pack(fill="x", pady=(screen_height / 1080) * 10)
@@ -866,7 +708,8 @@ def main():
 
     def add_obec_window():
         """
-        Add a new window with a combobox to select a kraj.
+        Add a new window with a search box and a combobox to select a kraj.
+        Typing into the search box lists the matching obce, choosing one adds it at once.
         Upon selecting a kraj, the second combobox will be enabled and populated with okresy.
         Upon selecting an okres, the third combobox will be enabled and populated with obce.
         """
@@ -877,29 +720,63 @@ def main():
         global quoted_obecADD_nazvy
         global combo_var_obecADD
 
-        # Check if root already exists and destroy it if it does remove it
-        if add_obec_root is not None:
-            try:
-                add_obec_root.destroy()
-            except:
-                pass
-            # Window creation
-        add_obec_root = tk.Tk()
+        # Show the window if it was already created, the last selection is kept
+        if dialogs.show("add_obec") is not None:
+            return
+        # Window creation
         if 1.6 < screen_width / screen_height < 1.7 or screen_height == 1080:
-            add_obec_root.geometry(f"{(int(screen_width * 0.25))}x{(int(screen_height * 0.48))}")
+            geometry = f"{(int(screen_width * 0.25))}x{(int(screen_height * 0.66))}"
         elif screen_width == 1128 or screen_width == 1280:
-            add_obec_root.geometry(f"{(int(screen_width * 0.25))}x{(int(screen_height * 0.75))}")
+            geometry = f"{(int(screen_width * 0.25))}x{(int(screen_height * 0.95))}"
         else:
-            add_obec_root.geometry(f"{(int(screen_width * 0.25))}x{(int(screen_height * 0.75))}")
-        add_obec_root.title("GeoLog - přidej obec")
-        add_obec_root.tk.call("source", "files/azure.tcl")
-        add_obec_root.tk.call("set_theme", "light")
-        add_obec_root.iconbitmap("files/ico.ico")
-        add_obec_root.update()
+            geometry = f"{(int(screen_width * 0.25))}x{(int(screen_height * 0.95))}"
+        add_obec_root = dialogs.create("add_obec", "GeoLog - přidej obec", geometry)
+
+        desc_font = ("Raleway", 10)  # Specify the font family and size for the description
+
+        # SEARCH BOX
+        label = Label(add_obec_root, text="Hledej obec (obec, okres):", font=desc_font)
+        label.pack(pady=screen_height / 1080)
+
+        search_var = tk.StringVar(add_obec_root)
+        search_entry = tk.Entry(add_obec_root, textvariable=search_var, width=30)
+        search_entry.pack(pady=(screen_height / 1080) * 5)
+
+        # Matching obce as "nazev_obce (nazev_okre)", double click or Enter adds the obec
+        search_results = tk.Listbox(add_obec_root, height=5, width=40)
+        search_results.pack(pady=(screen_height / 1080) * 5)
+        found_obce = []
+
+        def search_obec(*args):
+            """
+            List the obce matching the text in the search box, called on every change of the text.
+            """
+            found_obce[:] = obec_search.search(search_var.get())
+            search_results.delete(0, tk.END)
+            for obec, okres, _ in found_obce:
+                search_results.insert(tk.END, f"{obec} ({okres})")
+
+        def add_found_obec(event=None):
+            """
+            Insert the chosen (or the best) match of the search box into the database.
+            """
+            if not found_obce:
+                return
+            selection = search_results.curselection()
+            obec, okres, OBECID = found_obce[selection[0] if selection else 0]
+            insert_visit(OBECID, obec, okres)
+
+        search_var.trace_add("write", search_obec)
+        search_entry.bind("<Return>", add_found_obec)
+        search_results.bind("<Return>", add_found_obec)
+        search_results.bind("<Double-Button-1>", add_found_obec)
+
+        # Separator between the search box and the comboboxes
+        separator = ttk.Separator(add_obec_root, orient="horizontal")
+        separator.pack(fill="x", pady=(screen_height / 1080) * 10)
 
         # COMBOBOXES CREATION
         # kraj selection
-        desc_font = ("Raleway", 10)  # Specify the font family and size for the description
         label = Label(add_obec_root, text="Vyber kraj:", font=desc_font)
         label.pack(pady=screen_height / 1080)
 
@@ -951,6 +828,20 @@ def main():
         cal.pack(pady=(screen_height / 1080) * 20)
         cal['state'] = 'readonly'
 
+        def insert_visit(OBECID, obec, okres):
+            """
+            Insert the obec with the date selected in the calendar into the database.
+            """
+            selected_date = cal.get()
+            sqldate = selected_date[6:10] + "-" + selected_date[3:5] + "-" + selected_date[0:2]
+            # Insert the obecID and date into the database, unless obec is already in the database
+            if not visit_store.add_visit(user, OBECID, sqldate):
+                print("obec uz je zaznamenana")
+                return
+            print("obec pridana: " + obec + "(" + okres + ") -" + selected_date)
+
+            re_plot()
+
         def IMPORTobec():
             """
             Insert the selected obec into the database upon button click.
@@ -958,28 +849,13 @@ def main():
             global ADDokres
             global ADDobec
 
-            selected_date = cal.get()
-            sqldate = selected_date[6:10] + "-" + selected_date[3:5] + "-" + selected_date[0:2]
             # Get the obecID of the selected obec and okres
-            OBECID = \
-                obce_shp[(obce_shp['nazev_okre'] == ADDokres) & (obce_shp['nazev_obce'] == ADDobec)]['kod_obce'].iloc[0]
-            # Insert the obecID and date into the database
-
-            obecIDs = cursor.execute("SELECT obecID FROM " + user)
-            obecIDs = obecIDs.fetchall()
-            obecIDs = [int(item[0]) for item in obecIDs]
-
-            # Check if obec is already in the database
-            if OBECID in obecIDs:
-                print("obec uz je zaznamenana")
+            obec_id = admin_index.kod_obce(ADDokres, ADDobec)
+            if obec_id is None:
+                print("obec neni v okrese: " + str(ADDobec) + "(" + str(ADDokres) + ")")
+                ADDbutton.config(state="disabled")
                 return
-
-            # Insert the obecID and date into the database
-            cursor.execute("INSERT INTO " + user + " (obecID, dat) VALUES (?, ?)", (str(OBECID), sqldate))
-            conn.commit()
-            print("obec pridana: " + ADDobec + "(" + ADDokres + ") -" + selected_date)
-
-            re_plot()
+            insert_visit(obec_id, ADDobec, ADDokres)
 
         ADDbutton = tk.Button(add_obec_root, text="Přidej obec", command=IMPORTobec, bg="light green",
                               padx=(screen_width / 1920) * 10,
@@ -996,6 +872,8 @@ def main():
             global combo_var_krajeADD
 
             ADDkraj = combo_var_krajeADD.get()
+            # The obec selected before does not belong to the new kraj
+            ADDbutton.config(state="disabled")
 
             # Check if "Celá ČR" is selected
             if ADDkraj == "Celá ČR":
@@ -1005,7 +883,7 @@ def main():
                 combo_box_obecADD['state'] = 'disabled'
                 return
             # Enable the second combobox, fill it wih okresy and reset the selection
-            quoted_okresyADD_nazvy = list(okresy_shp[okresy_shp['Název_kra'] == ADDkraj]['Název_okr'])
+            quoted_okresyADD_nazvy = admin_index.okresy(ADDkraj)
             combo_box_okresyADD['values'] = quoted_okresyADD_nazvy
             combo_box_okresyADD.set('--vyber okres--')
             combo_box_okresyADD['state'] = 'readonly'
@@ -1023,9 +901,11 @@ def main():
             global ADDokres
 
             ADDokres = combo_var_okresyADD.get()
+            # The obec selected before does not belong to the new okres
+            ADDbutton.config(state="disabled")
             combo_box_obecADD.set("--vyber obec--")
             combo_box_obecADD['state'] = 'readonly'  # Enable the third combobox
-            quoted_obecADD_nazvy = list(obce_shp[obce_shp['nazev_okre'] == ADDokres]['nazev_obce'])
+            quoted_obecADD_nazvy = admin_index.obec_names(ADDokres)
             combo_box_obecADD['values'] = quoted_obecADD_nazvy
 
         def ADDobec(event):
@@ -1041,9 +921,6 @@ def main():
         combo_box_okresyADD.bind("<<ComboboxSelected>>", ADDokresy)
         combo_box_obecADD.bind("<<ComboboxSelected>>", ADDobec)
 
-        add_obec_root.protocol("WM_DELETE_WINDOW", add_obec_root.destroy)
-        # Destroy removeuserpanelroot when the user closes the window
-
     def stopar_window():
         """
         Add a new window with a button to select a GPX file.
@@ -1053,24 +930,17 @@ def main():
 
         global stoparFILE
         global stopar_root
-        # Check if root already exists and destroy it if it does remove it
-        if stopar_root is not None:
-            try:
-                stopar_root.destroy()
-            except:
-                pass
+        # Show the window if it was already created, the selected file is kept
+        if dialogs.show("stopar") is not None:
+            return
         # Window creation
-        stopar_root = tk.Tk()
         if 1.6 < screen_width / screen_height < 1.7 or screen_height == 1080:
-            stopar_root.geometry(f"{(int(screen_width * 0.25))}x{(int(screen_height * 0.20))}")
+            geometry = f"{(int(screen_width * 0.25))}x{(int(screen_height * 0.24))}"
         elif screen_width == 1128:
-            stopar_root.geometry(f"{(int(screen_width * 0.65))}x{(int(screen_height * 0.30))}")
+            geometry = f"{(int(screen_width * 0.65))}x{(int(screen_height * 0.30))}"
         else:
-            stopar_root.geometry(f"{(int(screen_width * 0.65))}x{(int(screen_height * 0.30))}")
-        stopar_root.title("GeoLog - načti soubor - Stopař")
-        stopar_root.tk.call("source", "files/azure.tcl")
-        stopar_root.tk.call("set_theme", "light")
-        stopar_root.iconbitmap("files/ico.ico")
+            geometry = f"{(int(screen_width * 0.65))}x{(int(screen_height * 0.30))}"
+        stopar_root = dialogs.create("stopar", "GeoLog - načti soubor - Stopař", geometry)
 
         def browseFiles():
             """
@@ -1101,98 +971,32 @@ def main():
             Select the obecID based on the coordinates.
             Retrieve first date for each obecID from GPX file.
             If obecID is already in the database, will not be added again.
-            Insert the obecID and date into the database.
+            Insert all new obecIDs and dates into the database in one transaction.
             Replot the map.
             """
             global stoparFILE
-            with open(stoparFILE, 'r') as file:
-
-                # Check if the file is a valid GPX file
-                try:
-                    gpx = gpxpy.parse(file)
-                except:
-                    label_StoparError.configure(text="Chyba při načítání souboru", fg="red")
-                    return
-                if not gpx:
-                    label_StoparError.configure(text="Chyba při načítání souboru", fg="red")
-                    return
-                if not gpx.tracks:
-                    label_StoparError.configure(text="Chyba při načítání souboru", fg="red")
-                    return
-                if not gpx.tracks[0].segments:
-                    label_StoparError.configure(text="Chyba při načítání souboru", fg="red")
-                    return
-                if not gpx.tracks[0].segments[0].points:
-                    label_StoparError.configure(text="Chyba při načítání souboru", fg="red")
-                    return
-                if len(gpx.tracks[0].segments[0].points) < 1:
-                    label_StoparError.configure(text="Chyba při načítání souboru", fg="red")
-                    return
-
-                # Initialize lists to store latitude and longitude
-                latitudes = []
-                longitudes = []
-
-                n = 10  # Every n-th point will be used
-
-                # Iterate through tracks, segments, and points
-                for track in gpx.tracks:
-                    for segment in track.segments:
-                        filtered_points = segment.points[::n]
-                        latitudes.extend(point.latitude for point in filtered_points)
-                        longitudes.extend(point.longitude for point in filtered_points)
-
-                # Convert latitude and longitude to the S-JTSK coordinate system
-                transformer = Transformer.from_crs("EPSG:4326", "EPSG:5514")
-                coordinates = transformer.transform(latitudes, longitudes)
-
-                # Select ObecID based on the coordinates
-                selected_obecIDs = []
-                for i in range(len(coordinates[0])):
-                    try:
-                        selected_obecIDs.append(
-                            obce_shp[obce_shp['geometry'].contains(Point(coordinates[0][i], coordinates[1][i]))][
-                                'kod_obce'].iloc[0])
-                    except:
-                        print("bod mimo ČR")
-                        continue
-                # Retrieve first date for each obecID from GPX file
-                dates = []
-                for track in gpx.tracks:
-                    for segment in track.segments:
-                        for point in segment.points:
-                            dates.append(point.time)
-
-                # select position index of first occurence of each unique obecID
-                occurences = [0]
-                for i in range(1, len(selected_obecIDs)):
-                    if selected_obecIDs[i] != selected_obecIDs[i - 1]:
-                        occurences.append(i)
-
-                # select dates of first occurence of each unique obecID
-                dates = [dates[i] for i in occurences]
-                # convert dates to SQL entry string
-                dates = [str(date)[0:10] for date in dates]
-
-                selected_obecIDs = list(set(selected_obecIDs))  # Remove duplicates
-
-                # Get the obecIDs from the database
-                obecIDs = cursor.execute("SELECT obecID FROM " + user)
-                obecIDs = obecIDs.fetchall()
-                obecIDs = [int(item[0]) for item in obecIDs]
-
-                # Check if obec is already in the database and remove it from the list if it is
-                selected_obecIDs = [x for x in selected_obecIDs if x not in obecIDs]
-
-                # Insert the obecID and date into the database
-                for i in range(len(selected_obecIDs)):
-                    cursor.execute("INSERT INTO " + user + " (obecID, dat) VALUES (?, ?)",
-                                   (str(selected_obecIDs[i]), dates[i]))
-                    conn.commit()
-                    print("obec pridana: " + str(selected_obecIDs[i]) + " -" + dates[i])
-
-                re_plot()
-                stopar_root.destroy()
+
+            # Stream the file chunk by chunk, transform the coordinates to S-JTSK
+            # and select the obecIDs with dates of the first visit. A file imported before is not read again,
+            # from a file with new points appended only the new points are read (import ledger).
+            # The points read are stored in the track archive of the user
+            try:
+                mode = MODE_SEGMENTS if stopar_segments.get() else MODE_POINTS
+                first_dates = import_gpx(visit_store, user, stoparFILE, obce_geocoder, mode, TrackArchive(user))
+            except (OSError, TypeError, ValueError, KeyError, ExpatError):
+                label_StoparError.configure(text="Chyba při načítání souboru", fg="red")
+                return
+            if not first_dates:
+                label_StoparError.configure(text="Chyba při načítání souboru", fg="red")
+                return
+
+            # Insert all obecIDs and dates into the database in one transaction,
+            # obce already in the database are skipped
+            added = visit_store.add_visits(user, first_dates.items())
+            print("obci pridano: " + str(added))
+
+            re_plot()
+            dialogs.hide("stopar")
 
         # Button to open file explorer
         button_explore = ttk.Button(stopar_root, text="Načti soubor", command=browseFiles)
@@ -1202,6 +1006,12 @@ def main():
         label_file = Label(stopar_root, text="-- žádný soubor --", font=desc_font, fg="blue")
         label_file.pack(pady=(screen_width / 1920) * 10)  # show description
 
+        # Checkbox to match also obce crossed between two track points (sparse or fast tracks)
+        stopar_segments = tk.BooleanVar(stopar_root, value=True)
+        check_segments = ttk.Checkbutton(stopar_root, text="Zahrnout projeté obce mezi body trasy",
+                                         variable=stopar_segments)
+        check_segments.pack(pady=(screen_height / 1080) * 5)
+
         # Button to process the selected file
         button_startStopar = tk.Button(stopar_root, text="Nahraj soubor", command=processGPX, bg="light green",
                                        fg="black",
@@ -1214,8 +1024,8 @@ def main():
         label_StoparError = Label(stopar_root, text=" ", font=desc_font, fg="red")
         label_StoparError.pack(pady=(screen_height / 1080) * 5)  # show description
 
-        stopar_root.protocol("WM_DELETE_WINDOW", stopar_root.destroy)
-        # Destroy stopar_root when the user closes the window
+        # Clear the error of the previous opening
+        dialogs.on_show("stopar", lambda: label_StoparError.configure(text=" "))
 
     def remove_obec_window():
         """
@@ -1228,33 +1038,15 @@ def main():
         global REMstring
         REMstring = None
 
-        # Check if root already exists
-        if remove_obec_root is not None:
-            try:
-                remove_obec_root.destroy()
-            except:
-                pass
+        # Show the window if it was already created, the visited obce are filled again
+        if dialogs.show("remove_obec") is not None:
+            return
         # Window creation
-        remove_obec_root = tk.Tk()
         if screen_width / screen_height > 1.6:
-            remove_obec_root.geometry(f"{(int(screen_width * 0.25))}x{(int(screen_height * 0.25))}")
+            geometry = f"{(int(screen_width * 0.25))}x{(int(screen_height * 0.25))}"
         else:
-            remove_obec_root.geometry(f"{(int(screen_width * 0.55))}x{(int(screen_height * 0.25))}")
-        remove_obec_root.title("GeoLog - odeber obec")
-        remove_obec_root.tk.call("source", "files/azure.tcl")
-        remove_obec_root.tk.call("set_theme", "light")
-        remove_obec_root.iconbitmap("files/ico.ico")
-        remove_obec_root.update()
-
-        # Get the obecIDs from the database
-        obecIDs = cursor.execute("SELECT obecID FROM " + user)
-        obecIDs = obecIDs.fetchall()
-        obecIDs = [int(item[0]) for item in obecIDs]
-
-        # Get the obec names from shapefile
-        obecnames_andIDs = obce_shp[obce_shp['kod_obce'].isin(obecIDs)][['nazev_obce', 'kod_obce']].values.tolist()
-        # Create a list of strings in the format "nazev_obce(kod_obce)"
-        obecnames_andIDs_str = [f'{item[0]}({item[1]})' for item in obecnames_andIDs]
+            geometry = f"{(int(screen_width * 0.55))}x{(int(screen_height * 0.25))}"
+        remove_obec_root = dialogs.create("remove_obec", "GeoLog - odeber obec", geometry)
 
         # Text
         label = Label(remove_obec_root, text="Vyber obec pro smazání:", font=desc_font)
@@ -1263,11 +1055,24 @@ def main():
         # Combobox
         combo_var_REMobec = tk.StringVar(remove_obec_root)
 
-        combo_box_REMobec = ttk.Combobox(remove_obec_root, textvariable=combo_var_REMobec, values=obecnames_andIDs_str)
+        combo_box_REMobec = ttk.Combobox(remove_obec_root, textvariable=combo_var_REMobec, values=[])
         combo_box_REMobec.pack(pady=(screen_height / 1080) * 20)
-        combo_var_REMobec.set("--vyber obec--")
         combo_box_REMobec['state'] = 'readonly'
 
+        def fill_obce():
+            """
+            Fill the combobox with the obce visited by the user.
+            """
+            # Get the obecIDs from the database
+            obecIDs = visit_store.visited_ids(user)
+
+            # Get the obec names from shapefile
+            obecnames_andIDs = obce_shp[obce_shp['kod_obce'].isin(obecIDs)][['nazev_obce', 'kod_obce']].values.tolist()
+            # Create a list of strings in the format "nazev_obce(kod_obce)"
+            obecnames_andIDs_str = [f'{item[0]}({item[1]})' for item in obecnames_andIDs]
+            combo_box_REMobec['values'] = obecnames_andIDs_str
+            combo_var_REMobec.set("--vyber obec--")
+
         def REMcombobox(event):  # Update the global variable REMstring with the selected obecID
 
             global combo_var_REMobec
@@ -1283,29 +1088,17 @@ def main():
             """
             global REMstring
             global user
-            global conn
-            global cursor
             global combo_var_REMobec
 
             if REMstring is None:
                 return
 
-            dbstring = "DELETE FROM " + user + " WHERE obecID = " + str(REMstring) + " ;"
-            cursor.execute(dbstring)
-            conn.commit()
+            visit_store.remove_visit(user, REMstring)
             print("obec odebrana: " + str(REMstring))
 
             # UPDATE THE COMBOBOX WITH THE REMOVED OBEC
-            obecIDs = cursor.execute("SELECT obecID FROM " + user)
-            obecIDs = obecIDs.fetchall()
-            obecIDs = [int(item[0]) for item in obecIDs]
-
-            # Get the obec names from the database
-            obecnames_andIDs = obce_shp[obce_shp['kod_obce'].isin(obecIDs)][['nazev_obce', 'kod_obce']].values.tolist()
-            # Create a list of strings in the format "nazev_obce(kod_obce)"
-            obecnames_andIDs_str = [f'{item[0]}({item[1]})' for item in obecnames_andIDs]
-            combo_box_REMobec['values'] = obecnames_andIDs_str
-            combo_var_REMobec.set("--vyber obec--")
+            REMstring = None
+            fill_obce()
 
             re_plot()
             root.update()
@@ -1322,7 +1115,8 @@ def main():
 
         combo_box_REMobec.bind("<<ComboboxSelected>>", REMcombobox)
 
-        remove_obec_root.protocol("WM_DELETE_WINDOW", remove_obec_root.destroy)
+        fill_obce()
+        dialogs.on_show("remove_obec", fill_obce)
 
     # Create button to open add_obec_window
     button1 = tk.Button(root2, text="Přidej obec", command=add_obec_window, bg="green", padx=(screen_width / 1920) * 10,
@@ -1344,51 +1138,55 @@ def main():
     button2.pack(padx=(screen_width / 1920) * 5)
     button3.pack(padx=(screen_width / 1920) * 5)
 
+    # Dashboards of the statistics windows with functions returning their values,
+    # the shown ones are updated in place after every change of the visits
+    stat_dashboards = {}
+
+    def refresh_statistics():
+        """
+        Update the pie charts of the shown statistics windows, hidden ones are updated when shown again.
+        """
+        for dashboard, values in stat_dashboards.values():
+            if dashboard.is_shown():
+                dashboard.update(values())
+
     def statistics():
         """
         Create a new window to show pie charts with whole state statistics and region statistics.
-        Shows region statistics in a canvas with a scrollbar.
+        All pie charts are one figure, which is updated in place when the visits change.
         Shows button to open a new window with statistics in selected okreses.
         """
-        okres_names = okresy_shp['Název_okr'].unique()
+        global root_stat
         global root_statOKR
 
+        # Show the window if it was already created, the pie charts are updated
+        if dialogs.show("statistics") is not None:
+            return
+
+        okres_names = okresy_shp['Název_okr'].unique()
+        # Edit pie chart label size for resolution
+        fontsize = 8 if screen_width < 1920 else 12
+
         def reopen_stats():
             """
             Reopen the statistics window with kraje.
             """
-            global root_statOKR
-            try:
-                root_statOKR.destroy()
-            except:
-                pass
+            dialogs.hide("okr_statistics")
             statistics()
 
         def okr_stats():
             """
             Create a new window with a combobox to select an okres.
-            Upon selecting an okres, the percentage of visited obce in the okres will be calculated.
-            A pie chart will be created to show the percentage of visited obce in the okres in new widow.
             Shows 3 most visited okreses with precentages in pie graphs.
-            :return:
+            Upon selecting an okres, the percentage of visited obce in the okres is shown in the fourth pie graph.
             """
             global root_statOKR
-            try:
-                root_stat.destroy()
-            except:
-                pass
-
-            root_statOKR = tk.Toplevel()
-            if 1.6 < screen_width / screen_height < 1.7 or screen_height == 1080:
-                root_statOKR.geometry(f"{(screen_width - 200)}x{(screen_height - 200)}")
-            elif screen_width == 1128:
-                root_statOKR.geometry(f"{(screen_width - 200)}x{(screen_height)}")
-            else:
-                root_statOKR.geometry(f"{(screen_width - 200)}x{(screen_height)}")
+            dialogs.hide("statistics")
+            if dialogs.show("okr_statistics") is not None:
+                return
 
-            root_statOKR.title("GeoLog - Statistika v okresech")
-            root_statOKR.iconbitmap("files/ico.ico")
-            root_statOKR.resizable(False, False)
+            root_statOKR = dialogs.create("okr_statistics", "GeoLog - Statistika v okresech", stat_geometry,
+                                          resizable=False)
 
             Label(root_statOKR, text="Statistika v okresech", font=("Raleway", 20)).pack(pady=(screen_height / 1080) *
                                                                                               10)
@@ -1398,50 +1196,27 @@ def main():
             Label(root_statOKR, text="Vyber jiný okres:", font=("Raleway", 12)).pack(pady=(screen_height / 1080) *
                                                                                           2)
 
-            def okr_stats2(event):
+            def okr_values():
                 """
-                Create a new window with a pie chart to show the percentage of visited obce in the selected okres.
+                Return the values of the pie charts - 3 most visited okreses and the selected okres.
                 """
+                okres_percentage = {okres_name: round(value, 3)
+                                    for okres_name, value in visit_store.top_regions(user, COVERAGE_OKRES, 3).items()}
+                values = [(okres_name, f"{value:.1f}%", value) for okres_name, value in okres_percentage.items()]
+                values += [None] * (3 - len(values))
 
-                global combo_var_okresySTAT
                 okr = combo_var_okresySTAT.get()
-                # Select all obecIDs from shpfile for okr
-                okr_obecIDs = obce_shp[obce_shp['nazev_okre'] == okr]['kod_obce'].unique()
-
-                # Pick the obecIDs from the database that are in the selected okres
-                okr_obecIDs_db = cursor.execute(
-                    f"SELECT obecID FROM {user} WHERE obecID IN ({','.join(map(str, okr_obecIDs))})")
-                okr_obecIDs_db = okr_obecIDs_db.fetchall()
-                percentage = round((len(okr_obecIDs_db) / len(okr_obecIDs)) * 100, 2)
-
-                root_STAT_okr_Selection = tk.Toplevel()
-                root_STAT_okr_Selection.geometry(f"{(int(screen_height * 0.6))}x{(int(screen_height * 0.4))}")
-                root_STAT_okr_Selection.title("GeoLog - Statistika vybraného okresu")
-                root_STAT_okr_Selection.iconbitmap("files/ico.ico")
-                root_STAT_okr_Selection.resizable(False, False)
-
-                # Create a pie chart graph for the percentage of visited obce in the selected okres
-                def create_pie_chart(value, title):
-                    colors = ['red', '#F9FCDD']
-                    fig, ax = plt.subplots()
-                    percentages = [value, 100 - value]
-                    ax.pie(percentages, autopct='%1.2f%%', startangle=90, colors=colors)
-                    ax.axis('equal')
-                    ax.set_title(title)
-
-                    return fig
-
-                print("Okres:", okr)
-                print("Procento navštívenosti[%]:", percentage)
-                fig = create_pie_chart(percentage, f"{okr}")
-                fig.set_size_inches(3, 3)
-
-                # Embed the chart in Tkinter using place method
-                canvas = FigureCanvasTkAgg(fig, master=root_STAT_okr_Selection)
-                canvas_widget = canvas.get_tk_widget()
-                canvas_widget.pack(side=tk.TOP, fill=tk.BOTH)
-
-                root_STAT_okr_Selection.protocol("WM_DELETE_WINDOW", root_STAT_okr_Selection.destroy)
+                if okr in okresy_names_edit:
+                    percentage = round(visit_store.coverage(user, COVERAGE_OKRES).get(okr, 0.0), 2)
+                    values.append((f"Vybraný okres:\n{okr}", f"{percentage:.2f}%", percentage))
+                return values
+
+            def okr_stats2(event):
+                """
+                Show the percentage of visited obce in the selected okres in the last pie chart.
+                """
+                print("Okres:", combo_var_okresySTAT.get())
+                okr_dashboard.update(okr_values())
 
             # Combobox
             okresy_names_edit = list(okres_names)
@@ -1460,87 +1235,23 @@ def main():
             separator = ttk.Separator(root_statOKR, orient="horizontal")
             separator.pack(fill="x", pady=(screen_height / 1080) * 10)
 
-            # Select all obecIDs from shpfile for each okres
-            okres_obecIDs = {}
-            for okres_name in okres_names:
-                okres_obecIDs[okres_name] = obce_shp[obce_shp['nazev_okre'] == okres_name]['kod_obce'].unique()
-
-            # Create a new dictionary to store the percentage of visited obce in each okres
-            okres_length = {}
-            okres_percentage = {}
-
-            for okres_name, okres_obecIDs_value in okres_obecIDs.items():
-                okres_length[okres_name] = len(okres_obecIDs_value)
-
-                okres_obecIDs_db = cursor.execute(
-                    f"SELECT obecID FROM {user} WHERE obecID IN ({','.join(map(str, okres_obecIDs_value))})")
-                if okres_length[okres_name] == 0:
-                    okres_percentage[okres_name] = 0  # Set percentage to 0 if denominator is zero (Prague?)
-                else:
-                    okres_percentage[okres_name] = round(
-                        (len(okres_obecIDs_db.fetchall()) / okres_length[okres_name]) * 100, 3)
-
-            # Select 3 highest values from okres_percentage and plot them in a 3 pie charts
-            okres_percentage = dict(sorted(okres_percentage.items(), key=lambda item: item[1], reverse=True))
-            okres_percentage = dict(itertools.islice(okres_percentage.items(), 3))
-            print(okres_percentage)
             Label(root_statOKR, text="Nejnavštěvovanější okresy:", font=("Raleway", 12)).pack()
 
-            # Create 3 pie chart graphs for the 3 values in okres_percentage in a row
-            def create_pie_chart(value, title):
-                colors = ['red', '#F9FCDD']
-                fig, ax = plt.subplots()
-                percentages = [value, 100 - value]
-                ax.pie(percentages, autopct='%1.1f%%', startangle=90, colors=colors)
-                ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle
-                ax.set_title(title)
-                return fig
-
-            # Create pie charts for each value in okres_percentage
-            for idx, (okres_name, value) in enumerate(okres_percentage.items()):
-                fig = create_pie_chart(value, f"{okres_name}")
-                # Edit plot size for resolution
-                if screen_width < 1920:
-                    fig.set_size_inches(1, 1)
-                else:
-                    fig.set_size_inches(3, 3)
-                # Edit pie chart label size for resolution
-                if screen_width < 1920:
-                    plt.setp(fig.axes[0].texts, size=8)
-                    # Also edit the title size
-                    fig.axes[0].title.set_size(8)
-
-                # Embed the chart in Tkinter using place method
-                canvas = FigureCanvasTkAgg(fig, master=root_statOKR)
-                canvas_widget = canvas.get_tk_widget()
-                # Make the canvas larger for resolution
-                if screen_width < 1920:
-                    canvas_widget.place(relx=(idx + 1) * 0.25, rely=0.5, anchor="center", y=-0, width=150, height=150)
-                if 1920 > screen_width >= 1280:
-                    canvas_widget.place(relx=(idx + 1) * 0.25, rely=0.5, anchor="center", y=-40, width=250, height=250)
-                else:
-                    canvas_widget.place(relx=(idx + 1) * 0.25, rely=0.5, anchor="center", y=-40)
-
-                root_statOKR.protocol("WM_DELETE_WINDOW", root_statOKR.destroy)
+            # 3 highest percentages of visited obce in okresy and the selected okres in one figure
+            okr_dashboard = PieDashboard(root_statOKR, 4, 4, fontsize)
+            okr_dashboard.widget.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+            okr_dashboard.update(okr_values())
+            stat_dashboards['okresy'] = (okr_dashboard, okr_values)
+            dialogs.on_show("okr_statistics", lambda: okr_dashboard.update(okr_values()))
 
-        global root_stat
-        if root_stat is not None:
-            try:
-                root_stat.destroy()
-            except:
-                pass
-        root_stat = tk.Tk()
         if 1.6 < screen_width / screen_height < 1.7 or screen_height == 1080:
-            root_stat.geometry(f"{(screen_width - 200)}x{(screen_height - 200)}")
+            stat_geometry = f"{(screen_width - 200)}x{(screen_height - 200)}"
         elif screen_width == 1128:
-            root_stat.geometry(f"{(screen_width - 200)}x{(screen_height)}")
+            stat_geometry = f"{(screen_width - 200)}x{(screen_height)}"
         else:
-            root_stat.geometry(f"{(screen_width - 200)}x{(screen_height)}")
-        root_stat.title("GeoLog - Statistika")  # Region and whole state statistics window creation
-        root_stat.iconbitmap("files/ico.ico")
-        root_stat.resizable(False, False)
-        root_stat.tk.call("source", "files/azure.tcl")
-        root_stat.tk.call("set_theme", "light")
+            stat_geometry = f"{(screen_width - 200)}x{(screen_height)}"
+        # Region and whole state statistics window creation
+        root_stat = dialogs.create("statistics", "GeoLog - Statistika", stat_geometry, resizable=False)
 
         Label(root_stat, text="Statistika", font=("Raleway", 20)).pack(pady=(screen_height / 1080) * 10)
 
@@ -1551,132 +1262,33 @@ def main():
         separator = ttk.Separator(root_stat, orient="horizontal")
         separator.pack(fill="x", pady=(screen_height / 1080) * 10)
 
-        # Select all obecIDs from database
-        obecIDs = cursor.execute("SELECT obecID FROM " + user)
-        obecIDs = len(obecIDs.fetchall())
-        obecIDs_shp = len(obce_shp['kod_obce'].unique())
-        All_obce_percentage = round((obecIDs / obecIDs_shp) * 100, 3)
-        fig, ax = plt.subplots()
-
-        # Edit plot size
-        if screen_width < 1920:
-            fig.set_size_inches(2, 2)
-            # Edit pie chart label size
-            plt.setp(fig.axes[0].texts, size=8)
-            # Also edit the title size
-            fig.axes[0].title.set_size(8)
-        else:
-            fig.set_size_inches(3, 3)
-
-        colors = ['red', '#F9FCDD']
-
-        # Plot the pie chart with specified colors
-        wedges, texts, autotexts = ax.pie([All_obce_percentage, 100 - All_obce_percentage],
-                                          labels=['', ''],
-                                          autopct='', startangle=90, colors=colors)
-
-        # Add annotation for 'Navštívené obce' text and percentage
-        if screen_width < 1920:
-            ax.annotate(f'Navštívené obce\n{All_obce_percentage:.3f}%',
-                        xy=(0.5, 0.5), xytext=(0, 0), textcoords='offset points',
-                        ha='center', va='center', fontsize=8, color='black')
-        else:
-            ax.annotate(f'Navštívené obce\n{All_obce_percentage:.3f}%',
-                        xy=(0.5, 0.5), xytext=(0, 0), textcoords='offset points',
-                        ha='center', va='center', fontsize=12, color='black', weight='bold')
-        ax.axis('equal')
-        ax.set_title("V celé ČR:")
-
         # Select all obecIDS from shpfile for each kraj
         region_names = ['Jihočeský kraj', 'Jihomoravský kraj', 'Kraj Vysočina', 'Královéhradecký kraj',
                         'Liberecký kraj', 'Moravskoslezský kraj', 'Olomoucký kraj', 'Pardubický kraj',
                         'Plzeňský kraj', 'Středočeský kraj', 'Ústecký kraj', 'Zlínský kraj']
 
-        region_percentage = {}
-
-        # Create a new dictionary to store the percentage of visited obce in each region
-        for region_name in region_names:
-            region_obecIDs = obce_shp[obce_shp['nazev_kraj'] == region_name]['kod_obce'].unique()
-            region_obecIDs_db = cursor.execute(
-                f"SELECT obecID FROM {user} WHERE obecID IN ({','.join(map(str, region_obecIDs))})")
-            region_length = len(region_obecIDs)
-            region_percentage[region_name] = round((len(region_obecIDs_db.fetchall()) / region_length) * 100, 3)
-
-        canvas = FigureCanvasTkAgg(fig, master=root_stat)
-        canvas.draw()
-        canvas.get_tk_widget().pack()
-
-        # Separator between buttons
-        separator = ttk.Separator(root_stat, orient="horizontal")
-        separator.pack(fill="x", pady=(screen_height / 1080) * 10)
-        Label(root_stat, text="Statistika krajů:", font=("Raleway", 12)).pack(pady=(screen_height / 1080) * 10)
-
-        # Create a canvas with a scrollbar
-        canvas_frame = Frame(root_stat)
-        canvas_frame.pack(side="top", fill="both", expand=True)
-
-        canvas = Canvas(canvas_frame)
-        scrollbar = Scrollbar(canvas_frame, orient="vertical", command=canvas.yview)
-        scrollbar.pack(side="right", fill="y")
-        canvas.pack(side="left", fill="both", expand=True)
-        canvas.configure(yscrollcommand=scrollbar.set)
-
-        # Create a frame inside the canvas to hold the graphs
-        frame_for_graphs = Frame(canvas)
-        canvas.create_window((0, 0), window=frame_for_graphs, anchor="nw")
-
-        # Counter for arranging graphs in rows of three
-        graph_counter = 0
-        if screen_width < 1920:
-            num_columns = 2
-        else:
-            num_columns = 5
-        row_counter = 0
-
-        # Iterate over the region_percentage dictionary and create pie charts
-        for region_name, region_percentage_value in region_percentage.items():
-            # Create a new figure for each region
-            fig_region, ax_region = plt.subplots(figsize=(2.4, 2.4))  # Adjust the size as needed
-
-            # Create a new canvas for each region
-            canvas_region = FigureCanvasTkAgg(fig_region, master=frame_for_graphs)
-            canvas_region.draw()
-
-            # Plot the pie chart with specified colors
-            wedges, texts, autotexts = ax_region.pie([region_percentage_value, 100 - region_percentage_value],
-                                                     labels=['', ''],
-                                                     autopct='', startangle=90, colors=colors)
-            words = region_name.split()
-            first_word = words[0]
-            second_word = words[1]
-
-            # Add annotation for 'Navštívené obce' text and percentage and put them in the center
-            ax_region.annotate(f'{first_word}\n{second_word}\n{region_percentage_value:.3f}%',
-                               xy=(0.2, 0.2), xytext=(0, 0), textcoords='offset points',
-                               ha='center', va='center', fontsize=12, color='black', weight='bold')
-
-            ax_region.axis('equal')
-            ax_region.set_title("V kraji:")
-
-            row_position = row_counter
-            col_position = graph_counter % num_columns
-
-            # Pack the canvas based on the calculated positions
-            canvas_region.get_tk_widget().grid(row=row_position, column=col_position, padx=10, sticky="nsew")
-
-            # Increment the graph counter
-            graph_counter += 1
-
-            # Check if three graphs have been displayed in a row, then start a new line
-            if graph_counter % num_columns == 0:
-                # Increment the row counter
-                row_counter += 1
-
-        # Update the scroll region of the canvas
-        frame_for_graphs.update_idletasks()
-        canvas.config(scrollregion=canvas.bbox("all"))
-
-        root_stat.protocol("WM_DELETE_WINDOW", root_stat.destroy)
+        def stat_values():
+            """
+            Return the values of the pie charts - the whole ČR and every region (stored coverage counters).
+            """
+            All_obce_percentage = round(visit_store.coverage(user, COVERAGE_STAT).get(COUNTRY, 0.0), 3)
+            values = [("V celé ČR:", f"Navštívené obce\n{All_obce_percentage:.3f}%", All_obce_percentage)]
+
+            kraj_percentages = visit_store.coverage(user, COVERAGE_KRAJ)
+            for region_name in region_names:
+                region_percentage_value = round(kraj_percentages.get(region_name, 0.0), 3)
+                words = region_name.split()
+                values.append(("V kraji:", f"{words[0]}\n{words[1]}\n{region_percentage_value:.3f}%",
+                               region_percentage_value))
+            return values
+
+        # The whole ČR and all regions in one figure, rendered at once
+        num_columns = 5 if screen_width < 1920 else 7
+        stat_dashboard = PieDashboard(root_stat, len(region_names) + 1, num_columns, fontsize)
+        stat_dashboard.widget.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        stat_dashboard.update(stat_values())
+        stat_dashboards['kraje'] = (stat_dashboard, stat_values)
+        dialogs.on_show("statistics", lambda: stat_dashboard.update(stat_values()))
 
     def date_selection():
         """
@@ -1687,27 +1299,16 @@ def main():
         global text_widget
         global date_picker_root
 
-        # Check if root already exists
-        if date_picker_root is not None:
-            try:
-                date_picker_root.destroy()
-            except:
-                pass
+        # Show the window if it was already created, the selected dates are kept
+        if dialogs.show("date_filter") is not None:
+            return
 
-        # Window creation
-        date_picker_root = tk.Tk()
+        # Window creation, not resizable
         if screen_width / screen_height > 1.6:
-            date_picker_root.geometry(f"{(int(screen_width * 0.30))}x{(int(screen_height * 0.45))}")
+            geometry = f"{(int(screen_width * 0.30))}x{(int(screen_height * 0.45))}"
         else:
-            date_picker_root.geometry(f"{(int(screen_width * 0.40))}x{(int(screen_height * 0.55))}")
-        date_picker_root.title("GeoLog - filtrování dle data")
-        date_picker_root.tk.call("source", "files/azure.tcl")
-        date_picker_root.tk.call("set_theme", "light")
-        date_picker_root.iconbitmap("files/ico.ico")
-        date_picker_root.update()
-
-        # make root not resizable
-        date_picker_root.resizable(False, False)
+            geometry = f"{(int(screen_width * 0.40))}x{(int(screen_height * 0.55))}"
+        date_picker_root = dialogs.create("date_filter", "GeoLog - filtrování dle data", geometry, resizable=False)
 
         desc_font = ("Raleway", 10)  # Specify the font family and size for the description
         label = Label(date_picker_root, text="Vyber mezi kterými daty \n chceš filtrovat své obce:\n\n OD:"
@@ -1741,28 +1342,16 @@ def main():
             """
             global text_widget
             global user
-            global cursor
 
             print("filtr: " + FROM + " " + TO)
             # FROM and TO - sql date format yyyy-mm-dd
             FROM = FROM[6:10] + "-" + FROM[3:5] + "-" + FROM[0:2]
             TO = TO[6:10] + "-" + TO[3:5] + "-" + TO[0:2]
 
-            # Get rows from the database
-            sqlquery = f"SELECT * FROM {user} WHERE dat BETWEEN ? AND ?;"
-            cursor.execute(sqlquery, (FROM, TO))
-            output = cursor.fetchall()
-            output_txt = ""
-            for row in output:
-                row = list(row)
-                # reformat the date to dd-mm-yyyy
-                DATE = row[2][8:10] + "-" + row[2][5:7] + "-" + row[2][0:4]
-                # get the obec name from the shapefile
-                intobecid = int(row[1])
-                OBEC = obce_shp[obce_shp['kod_obce'] == intobecid]['nazev_obce'].iloc[0]
-                # get the okres name from the shapefile
-                OKRES = obce_shp[obce_shp['kod_obce'] == intobecid]['nazev_okre'].iloc[0]
-                output_txt = output_txt + (DATE + " - " + OBEC + " (" + OKRES + ")\n")
+            # Get rows from the database (by the date index) joined with the obec and okres names,
+            # dates are already in dd-mm-yyyy format
+            output = visit_store.visits_between(user, FROM, TO)
+            output_txt = "".join(f"{DATE} - {OBEC} ({OKRES})\n" for DATE, OBEC, OKRES in output)
 
             # Clear existing content before inserting new content
             text_widget.config(state=tk.NORMAL)
@@ -1770,8 +1359,6 @@ def main():
             text_widget.insert(tk.END, output_txt)
             text_widget.config(state=tk.DISABLED)
 
-        date_picker_root.protocol("WM_DELETE_WINDOW", date_picker_root.destroy)
-
     # Separator between buttons
     separator = ttk.Separator(root2, orient="horizontal")
     separator.pack(fill="x", pady=(screen_height / 1080) * 10)
@@ -1806,6 +1393,62 @@ def main():
     bottom_frame = tk.Frame(root2)
     bottom_frame.pack(side='top')
 
+    ######################### LOADING GEODATA #########################
+    def on_loaded(loaded):
+        """
+        Called in the Tk thread once the background loading is finished.
+        Store the indexes built by load_geodata, draw the map and enable the controls working with geodata.
+        """
+        nonlocal kraje_shp, okresy_shp, obce_shp
+        global obce_geocoder
+        global admin_index
+        global obec_search
+
+        kraje_shp = geo_store.layer(kraje_shp_path)
+        okresy_shp = geo_store.layer(okresy_shp_path)
+        obce_shp = geo_store.layer(obce_shp_path)
+        obce_geocoder = loaded.geocoder
+        admin_index = loaded.admin_index
+        obec_search = loaded.obec_search
+        # Region codes of all obce for the coverage counters (statistics), counters not matching
+        # the visits are rebuilt
+        rebuilt = visit_store.set_regions(loaded.coverage_stats)
+        if rebuilt:
+            print("statistika prepocitana: " + ", ".join(rebuilt))
+        # Names of obce for the date filter
+        visit_store.set_gazetteer(loaded.gazetteer)
+
+        # Plot "kraje.shp" first and then overlay "okresy.shp" on top
+        plot_geopackage(root, gpkg_paths[::-1], loading_window)
+
+        # Fill the kraje combobox with the names from shapefile
+        kraje_nazvy = ['Celá ČR'] + list(kraje_shp['nazev'].unique())
+        combo_box_kraje['values'] = kraje_nazvy
+        combo_box_kraje['state'] = 'readonly'
+
+        # A user might have been selected during the loading
+        if user != "---":
+            enable_user_buttons()
+
+    def on_load_error(e):
+        print(f'Error occurred while loading geodata: {e}')
+        show_progress(0, "Chyba při načítání geodat")
+
+    def cancel_loading():
+        """
+        Stop the loading and quit the app once the worker stops, quit at once if the loading failed.
+        """
+        if loading_task.running():
+            loading_task.cancel()
+        else:
+            quit_app()
+
+    loading_task = BackgroundTask(root, load_geodata, on_loaded, on_error=on_load_error, on_cancel=quit_app)
+    # Display loading screen, the settings panel can be used while the data are loading
+    loading_window, show_progress = loading_screen(root, cancel_loading)
+    loading_task.on_progress = show_progress
+    loading_task.start()
+
     # protocol for actually quiting the app upon clicking on X
     root2.protocol("WM_DELETE_WINDOW", quit_app)
     root.protocol("WM_DELETE_WINDOW", quit_app)
@@ -1814,6 +1457,9 @@ def main():
 
 
 if __name__ == '__main__':
+    # With arguments the GPX files are imported without the GUI: python main.py <user> <GPX files>...
+    if len(sys.argv) > 1:
+        sys.exit(import_cli())
     main()
 
 #	°¦¦¦¦¦¦¦¦¦¦¦¦¦¦¦¦¦¦¦¦¦¦¦¦¦¦¦¦¦¦¦¦¦¦°
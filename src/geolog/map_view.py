@@ -0,0 +1,288 @@
+import tkinter as tk
+
+import numpy as np
+import pandas as pd
+import shapely
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.colors import to_rgba
+from matplotlib.path import Path
+
+from topology import NO_NEIGHBOUR
+
+VISITED_COLOR = to_rgba('red')
+NOT_VISITED_COLOR = (0.0, 0.0, 0.0, 0.0)
+# Opacity of the geometry outside of the selected kraj/okres
+DIM_ALPHA = 0.15
+# Margin around the selected kraj/okres (fraction of its size)
+ZOOM_MARGIN = 0.03
+
+
+def polygon_arrays(geometries):
+    """
+    Extract the rings (exterior and interiors) of all (Multi)Polygons at once into flat arrays.
+
+    Parameters:
+    geometries (array-like): The (Multi)Polygons.
+
+    Returns:
+    tuple: (coords, codes, offsets) - numpy.ndarray (n, 2) with coordinates of all rings one after
+    another, the matplotlib.path.Path code of every vertex (MOVETO at the start and CLOSEPOLY at the end
+    of each ring) and the offsets of the vertices of every geometry (len(geometries) + 1).
+    """
+    polygons, polygon_feature = shapely.get_parts(np.asarray(geometries), return_index=True)
+    not_empty = ~shapely.is_empty(polygons)
+    rings, ring_polygon = shapely.get_rings(polygons[not_empty], return_index=True)
+    coords, coord_ring = shapely.get_coordinates(rings, return_index=True)
+
+    ring_offsets = np.searchsorted(coord_ring, np.arange(len(rings) + 1))
+    codes = np.full(len(coords), Path.LINETO, dtype=Path.code_type)
+    codes[ring_offsets[:-1]] = Path.MOVETO
+    codes[ring_offsets[1:] - 1] = Path.CLOSEPOLY
+
+    coord_feature = polygon_feature[not_empty][ring_polygon][coord_ring]
+    offsets = np.searchsorted(coord_feature, np.arange(len(geometries) + 1))
+    return coords, codes, offsets
+
+
+def polygon_collection(geometries, **kwargs):
+    """
+    Create a PolyCollection with one compound path (all rings) for every (Multi)Polygon.
+    The paths are slices of the flat arrays of polygon_arrays, no GeoPandas plotting is involved.
+    """
+    coords, codes, offsets = polygon_arrays(geometries)
+    collection = PolyCollection([], **kwargs)
+    collection.set_verts_and_codes(np.split(coords, offsets[1:-1]), np.split(codes, offsets[1:-1]))
+    return collection
+
+
+class _ArcLayer:
+    """
+    Boundaries of all obce, okresy and kraje drawn as LineCollections of unique arcs.
+    A border shared by several features is drawn only once, in the color of its highest administrative level.
+    The collection of every level of detail is created only once, switching the level only changes
+    which collection is visible.
+    """
+
+    def __init__(self, ax, arcs, level_colors):
+        levels = range(max(level_colors) + 1)
+        self.level_colors = np.array([to_rgba(level_colors.get(level, 'none')) for level in levels])
+        self.ax = ax
+        self.arcs = arcs
+        self.levels = {}
+        self.collection = None
+        self.colors = np.empty((0, 4))
+        self.left = np.empty(0, dtype=np.int64)
+        self.right = np.empty(0, dtype=np.int64)
+
+    def set_level(self, tolerance):
+        """
+        Show the arcs simplified with the tolerance.
+        """
+        if tolerance not in self.levels:
+            gdf = self.arcs(tolerance)
+            # borders of a higher level are drawn over the lower ones
+            order = np.argsort(gdf['level'].to_numpy(), kind='stable')
+            coords, index = shapely.get_coordinates(gdf.geometry.values[order], return_index=True)
+            segments = np.split(coords, np.searchsorted(index, np.arange(1, len(gdf))))
+            colors = self.level_colors[gdf['level'].to_numpy()[order]]
+            collection = LineCollection(segments, colors=colors, zorder=2, visible=False)
+            self.ax.add_collection(collection, autolim=False)
+            self.levels[tolerance] = (collection, colors, gdf['left'].to_numpy()[order],
+                                      gdf['right'].to_numpy()[order])
+
+        if self.collection is not None:
+            self.collection.set_visible(False)
+        self.collection, self.colors, self.left, self.right = self.levels[tolerance]
+        self.collection.set_visible(True)
+
+    def highlight(self, in_view):
+        """
+        Dim the arcs which do not touch any obec in the view.
+        """
+        border = self.right != NO_NEIGHBOUR
+        visible = in_view[self.left] | (border & in_view[np.where(border, self.right, self.left)])
+        colors = self.colors.copy()
+        colors[~visible, 3] *= DIM_ALPHA
+        self.collection.set_color(colors)
+
+
+def _full_resolution(gdf):
+    """
+    Return geometries(tolerance) for a layer without simplified levels of detail.
+    """
+    return lambda tolerance: gdf.geometry.values
+
+
+def _region_codes(values):
+    """
+    Return the integer code of the region of every obec and {region name: code}.
+    """
+    codes, names = pd.factorize(values)
+    return codes, {name: code for code, name in enumerate(names)}
+
+
+def _region_mask(regions, name):
+    """
+    Return a mask of the obce lying in the region, regions are the codes of obce from _region_codes.
+    """
+    codes, names = regions
+    if name not in names:
+        return np.zeros(len(codes), dtype=bool)
+    return codes == names[name]
+
+
+def _in_view(kraje, okresy, kraj=None, okres=None):
+    """
+    Return a mask of the obce lying in the selected kraj/okres (everything if nothing is selected).
+    """
+    if okres is not None:
+        return _region_mask(okresy, okres)
+    if kraj is not None:
+        return _region_mask(kraje, kraj)
+    return np.ones(len(kraje[0]), dtype=bool)
+
+
+class MapView:
+    """
+    Persistent map embedded in the Tkinter window.
+
+    The Figure, its canvas widget and all artists are created only once. Boundaries are unique
+    arcs, so a border shared by obce, okresy and kraje is drawn only once. Zooming to a kraj or
+    okres only changes the axes limits, dims the geometry outside of it and switches the artists
+    to the level of detail matching the view (simplified geometry for small scales). The visited obce are
+    one collection with a path for every obec - adding or removing an obec only changes face
+    colors of this collection and schedules a redraw. The collections of every level of detail are
+    built once from flat coordinate arrays, switching the level only changes their visibility.
+    """
+
+    def __init__(self, root):
+        """
+        Parameters:
+        root (tkinter.Tk): The root Tkinter window.
+        """
+        self.fig, self.ax = plt.subplots()
+        self.ax.set_axis_off()
+        self.ax.set_aspect('equal')
+        self.canvas = FigureCanvasTkAgg(self.fig, master=root)
+        self.canvas_widget = self.canvas.get_tk_widget()
+        self.canvas_widget.pack(side=tk.TOP, fill=tk.BOTH, expand=1)
+
+        self._boundaries = None
+        self._visited = None
+        self._kody = np.empty(0, dtype=np.int64)
+        self._kraje = None
+        self._okresy = None
+        self._in_view = np.empty(0, dtype=bool)
+        self._visited_mask = np.empty(0, dtype=bool)
+        self._full_extent = None
+        self._tolerances = (0.0,)
+        self._tolerance = None
+        self._obce_geometries = None
+        self._obce_levels = {}
+
+    def prepare(self, arcs, level_colors, obce, kraj_column, okres_column, obce_geometries=None,
+                tolerances=(0.0,)):
+        """
+        Create the artists of the whole map. This is done only once.
+
+        Parameters:
+        arcs (callable): arcs(tolerance) returns the unique boundary arcs of obce for a level of detail
+                         (GeoDataFrame with 'level', 'left' and 'right' columns, see topology.build_arcs).
+        level_colors (dict): {administrative level (topology.LEVEL_*): color of its borders}.
+        obce (geopandas.GeoDataFrame): The obce which can be colored as visited.
+        kraj_column (str): The kraj name attribute of obce.
+        okres_column (str): The okres name attribute of obce.
+        obce_geometries (callable): geometries(tolerance) of obce for a level of detail.
+        tolerances (iterable): Simplification tolerances (metres) of the available levels of detail.
+
+        Returns:
+        None
+        """
+        self._tolerances = tuple(sorted(tolerances))
+        self._boundaries = _ArcLayer(self.ax, arcs, level_colors)
+
+        self._kody = obce['kod_obce'].to_numpy(dtype=np.int64)
+        self._kraje = _region_codes(obce[kraj_column])
+        self._okresy = _region_codes(obce[okres_column])
+        self._in_view = np.ones(len(self._kody), dtype=bool)
+        self._visited_mask = np.zeros(len(self._kody), dtype=bool)
+
+        self._obce_geometries = obce_geometries if obce_geometries is not None else _full_resolution(obce)
+
+        self._full_extent = tuple(obce.total_bounds)
+        self.zoom(self._full_extent)
+
+    def zoom(self, bounds, kraj=None, okres=None):
+        """
+        Zoom the map to the bounds and dim everything outside of the selected kraj/okres.
+
+        Parameters:
+        bounds (tuple): (minx, miny, maxx, maxy) of the view, None for the whole map.
+        kraj (str): The selected kraj, None for no selection.
+        okres (str): The selected okres, None for no selection.
+
+        Returns:
+        None
+        """
+        if bounds is None:
+            bounds = self._full_extent
+        minx, miny, maxx, maxy = bounds
+        margin = max(maxx - minx, maxy - miny) * ZOOM_MARGIN
+        self.ax.set_xlim(minx - margin, maxx + margin)
+        self.ax.set_ylim(miny - margin, maxy + margin)
+
+        self._set_level(self._level_for_view())
+        self._in_view = _in_view(self._kraje, self._okresy, kraj, okres)
+        self._boundaries.highlight(self._in_view)
+        self._update_faces()
+
+    def _level_for_view(self):
+        """
+        Return the coarsest level of detail whose tolerance is below the size of one pixel of the view.
+        """
+        width = self.ax.get_window_extent().width
+        xmin, xmax = self.ax.get_xlim()
+        pixel_size = (xmax - xmin) / width if width > 0 else 0.0
+        return max([tolerance for tolerance in self._tolerances if tolerance <= pixel_size], default=0.0)
+
+    def _set_level(self, tolerance):
+        if tolerance == self._tolerance:
+            return
+        self._tolerance = tolerance
+
+        self._boundaries.set_level(tolerance)
+        if tolerance not in self._obce_levels:
+            collection = polygon_collection(self._obce_geometries(tolerance), facecolors=NOT_VISITED_COLOR,
+                                            edgecolors='none', linewidths=0, zorder=1, visible=False)
+            self.ax.add_collection(collection, autolim=False)
+            self._obce_levels[tolerance] = collection
+
+        if self._visited is not None:
+            self._visited.set_visible(False)
+        self._visited = self._obce_levels[tolerance]
+        self._visited.set_visible(True)
+
+    def set_visited(self, obec_ids):
+        """
+        Color the visited obce in red, all other obce are left transparent.
+
+        Parameters:
+        obec_ids (array-like): kod_obce of the visited obce.
+
+        Returns:
+        None
+        """
+        self._visited_mask = np.isin(self._kody, np.asarray(obec_ids, dtype=np.int64))
+        self._update_faces()
+
+    def _update_faces(self):
+        if self._visited is None:
+            return
+
+        colors = np.zeros((len(self._kody), 4))
+        colors[self._visited_mask] = VISITED_COLOR
+        colors[self._visited_mask & ~self._in_view, 3] *= DIM_ALPHA
+        self._visited.set_facecolor(colors)
+        self.canvas.draw_idle()
@@ -0,0 +1,142 @@
+import numpy as np
+
+from admin_index import fold
+
+# Length of the n-grams for matching names with typos (bigrams also match swapped letters)
+NGRAM = 2
+# Minimal Dice similarity of the n-grams of a fuzzy match
+MIN_SIMILARITY = 0.5
+
+
+def _ngrams(folded):
+    """
+    Return the set of n-grams of the folded text padded with spaces (so that word starts weigh more).
+    """
+    padded = f" {folded} "
+    return {padded[idx:idx + NGRAM] for idx in range(len(padded) - NGRAM + 1)}
+
+
+def _insert(trie, key, entry_id):
+    """
+    Add the entry to the trie nodes of all prefixes of the key, node[""] holds the ids of the entries.
+    """
+    node = trie
+    for char in key:
+        node = node.setdefault(char, {})
+        ids = node.setdefault("", [])
+        if not ids or ids[-1] != entry_id:
+            ids.append(entry_id)
+
+
+def _prefix_ids(trie, prefix):
+    """
+    Return the ids of the entries with a key starting with the prefix.
+    """
+    node = trie
+    for char in prefix:
+        node = node.get(char)
+        if node is None:
+            return []
+    return node.get("", [])
+
+
+class ObecSearch:
+    """
+    Search-as-you-type index of obce names.
+
+    All names are folded (lower case without diacritics) once and numbered in the order of the
+    results - shorter names first, then alphabetically. Prefix tries over the whole names and over
+    the other words of the names hold the numbers of the names in this order, so the best names
+    starting with the typed text are the first ones of a trie node. Names with typos are found by
+    the n-grams shared with the typed text, counted for all names at once by np.bincount.
+
+    Typing "name, okres" limits the matches to okresy starting with the text after the comma,
+    the okres also tells apart the obce with the same name.
+    """
+
+    def __init__(self, obce):
+        """
+        Parameters:
+        obce (iterable): Tuples (okres name, obec name, kod_obce) of all obce, parts of one obec may repeat.
+        """
+        unique = {}
+        for okres, name, kod_obce in obce:
+            unique.setdefault(int(kod_obce), (name, okres))
+        entries = sorted(((fold(name), fold(okres), name, okres, kod_obce)
+                          for kod_obce, (name, okres) in unique.items()),
+                         key=lambda entry: (len(entry[0]), entry[0], entry[1]))
+
+        self._entries = [(name, okres, kod_obce) for _, _, name, okres, kod_obce in entries]
+        self._folded = [folded for folded, _, _, _, _ in entries]
+        self._okresy = [folded_okres for _, folded_okres, _, _, _ in entries]
+
+        # Whole names and names from the start of every other word
+        self._names = {}
+        self._words = {}
+        ngram_ids = {}
+        ngram_counts = []
+        for entry_id, folded in enumerate(self._folded):
+            _insert(self._names, folded, entry_id)
+            words = folded.split()
+            for idx in range(1, len(words)):
+                _insert(self._words, " ".join(words[idx:]), entry_id)
+
+            grams = _ngrams(folded)
+            ngram_counts.append(len(grams))
+            for gram in grams:
+                ngram_ids.setdefault(gram, []).append(entry_id)
+        self._ngrams = {gram: np.array(ids, dtype=np.int32) for gram, ids in ngram_ids.items()}
+        self._ngram_counts = np.array(ngram_counts, dtype=np.float64)
+
+    def _fuzzy_ids(self, query):
+        """
+        Return the ids of the entries with n-grams similar to the folded query, the most similar first.
+        """
+        grams = _ngrams(query)
+        postings = [self._ngrams[gram] for gram in grams if gram in self._ngrams]
+        if not postings:
+            return []
+
+        shared = np.bincount(np.concatenate(postings), minlength=len(self._entries))
+        similarity = 2.0 * shared / (len(grams) + self._ngram_counts)
+        ids = np.flatnonzero(similarity >= MIN_SIMILARITY)
+        # Stable sort keeps the order of the entries among the equally similar ones
+        return ids[np.argsort(-similarity[ids], kind="stable")].tolist()
+
+    def search(self, text, limit=10):
+        """
+        Find the obce matching the typed text, best matches first.
+
+        Names starting with the text (the exact name first) are followed by names with another word
+        starting with the text and by names with similar n-grams (typos).
+
+        Parameters:
+        text (str): The typed text, optionally "name, okres".
+        limit (int): The maximal number of matches.
+
+        Returns:
+        list: Tuples (obec name, okres name, kod_obce).
+        """
+        name, _, okres = text.partition(",")
+        query = " ".join(fold(name).split())
+        okres = " ".join(fold(okres).split())
+        if not query:
+            return []
+
+        found = []
+        seen = set()
+
+        def collect(ids):
+            for entry_id in ids:
+                if len(found) >= limit:
+                    return
+                if entry_id not in seen and self._okresy[entry_id].startswith(okres):
+                    seen.add(entry_id)
+                    found.append(entry_id)
+
+        collect(_prefix_ids(self._names, query))
+        collect(_prefix_ids(self._words, query))
+        # Typos are looked for only if there are not enough names starting with the text
+        if len(found) < limit and len(query) >= NGRAM:
+            collect(self._fuzzy_ids(query))
+        return [self._entries[entry_id] for entry_id in found]
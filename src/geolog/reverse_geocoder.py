@@ -0,0 +1,135 @@
+import numpy as np
+import shapely
+from shapely import STRtree
+
+# kod_obce returned for points lying outside of every obec (outside of ČR)
+OUTSIDE = -1
+# Maximal number of track points joined into one line by crossings()
+LINE_POINTS = 64
+
+
+class ReverseGeocoder:
+    """
+    Finds the obec (municipality) containing given S-JTSK coordinates.
+
+    The spatial index (STRtree) over the obce polygons is built once, a whole array
+    of points is then answered by a single bulk query.
+    """
+
+    def __init__(self, obce_gdf):
+        """
+        Parameters:
+        obce_gdf (geopandas.GeoDataFrame): The obce layer with 'kod_obce' column, in EPSG:5514.
+        """
+        self._geometries = obce_gdf.geometry.values
+        self._kody = obce_gdf['kod_obce'].to_numpy(dtype=np.int64)
+        self._tree = STRtree(self._geometries)
+
+    def lookup(self, x, y):
+        """
+        Return kod_obce of the obec containing each point.
+
+        Parameters:
+        x (array-like): X coordinates in S-JTSK (EPSG:5514).
+        y (array-like): Y coordinates in S-JTSK (EPSG:5514).
+
+        Returns:
+        numpy.ndarray: kod_obce for each point, OUTSIDE (-1) for points outside of all obce.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        kody = np.full(len(x), OUTSIDE, dtype=np.int64)
+        if len(x) == 0:
+            return kody
+
+        points = shapely.points(x, y)
+        point_idx, obec_idx = self._tree.query(points, predicate='intersects')
+
+        # a point on a shared border matches two obce - keep the first match only
+        kody[point_idx[::-1]] = self._kody[obec_idx[::-1]]
+        return kody
+
+    def crossings(self, x, y, time, segment):
+        """
+        Return every obec crossed by the track with the time of the first entry.
+
+        Consecutive points of the same track segment are joined into a line string which is
+        intersected with the indexed obce, so even obce between two distant GPS samples are found.
+        The time of the entry is interpolated along the line between the neighbouring points.
+
+        Parameters:
+        x (array-like): X coordinates in S-JTSK (EPSG:5514).
+        y (array-like): Y coordinates in S-JTSK (EPSG:5514).
+        time (numpy.ndarray): Time of each point (datetime64[s], may contain NaT).
+        segment (array-like): Track segment number of each point.
+
+        Returns:
+        tuple[numpy.ndarray, numpy.ndarray]: kod_obce and time of the entry (datetime64[s]) of each
+        crossing, ordered along the track. An obec crossed by several segments is listed for each of them.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        time = np.asarray(time, dtype="datetime64[s]")
+        segment = np.asarray(segment)
+        if len(x) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype="datetime64[s]")
+
+        # distance along the track at each point, used to order the crossings and to interpolate time
+        distance = np.concatenate(([0.0], np.cumsum(np.hypot(np.diff(x), np.diff(y)))))
+
+        # runs of points from the same segment
+        starts = np.flatnonzero(np.concatenate(([True], segment[1:] != segment[:-1])))
+        lengths = np.diff(np.append(starts, len(x)))
+        is_line = lengths >= 2
+
+        # single point segments are matched as points
+        single = starts[~is_line]
+        kody = [self.lookup(x[single], y[single])]
+        positions = [distance[single]]
+
+        if is_line.any():
+            # split long segments into short lines sharing their end points,
+            # so that each intersection only works with the vertices near the obec
+            step = LINE_POINTS - 1
+            n_lines = np.where(is_line, (lengths - 2) // step + 1, 0)
+            line_run = np.repeat(np.arange(len(starts)), n_lines)
+            line_part = np.arange(len(line_run)) - np.repeat(np.cumsum(n_lines) - n_lines, n_lines)
+            first = starts[line_run] + line_part * step
+            last = np.minimum(first + step, starts[line_run] + lengths[line_run] - 1)
+            counts = last - first + 1
+            vertex = np.repeat(first - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+            lines = shapely.linestrings(x[vertex], y[vertex], indices=np.repeat(np.arange(len(first)), counts))
+            line_start = distance[first]
+
+            line_idx, obec_idx = self._tree.query(lines, predicate='intersects')
+            inside = shapely.intersection(lines[line_idx], self._geometries[obec_idx])
+
+            # the entry is the first coordinate of the intersection part closest to the line start
+            parts, part_pair = shapely.get_parts(inside, return_index=True)
+            coords, coord_part = shapely.get_coordinates(parts, return_index=True)
+            coord_part, first_coord = np.unique(coord_part, return_index=True)
+            part_pair = part_pair[coord_part]
+            located = shapely.line_locate_point(lines[line_idx[part_pair]], shapely.points(coords[first_coord]))
+            entry = np.full(len(line_idx), np.inf)
+            np.minimum.at(entry, part_pair, located)
+
+            found = np.isfinite(entry)
+            kody.append(self._kody[obec_idx[found]])
+            positions.append(line_start[line_idx[found]] + entry[found])
+
+        kody = np.concatenate(kody)
+        positions = np.concatenate(positions)
+        order = np.argsort(positions, kind='stable')
+        kody = kody[order]
+        positions = positions[order]
+
+        # interpolate the time of the entry between the points with known time
+        known = ~np.isnat(time)
+        if known.any():
+            seconds = np.interp(positions, distance[known], time[known].astype(np.int64))
+            times = np.round(seconds).astype(np.int64).astype("datetime64[s]")
+        else:
+            times = np.full(len(positions), np.datetime64("NaT"), dtype="datetime64[s]")
+
+        outside = kody == OUTSIDE
+        return kody[~outside], times[~outside]
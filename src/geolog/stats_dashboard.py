@@ -0,0 +1,77 @@
+import math
+import tkinter as tk
+
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+
+VISITED_COLOR = 'red'
+NOT_VISITED_COLOR = '#F9FCDD'
+# Angle (degrees) where the visited wedge of every pie starts
+START_ANGLE = 90
+
+
+class PieDashboard:
+    """
+    Grid of pie charts with the percentage of visited obce, drawn as one matplotlib Figure
+    embedded in one Tk widget.
+
+    The wedges, labels and titles of all pies are created only once, new percentages only
+    change the angles of the wedges and the texts and the whole grid is rendered again at once.
+    """
+
+    def __init__(self, master, count, columns, fontsize=12):
+        """
+        Parameters:
+        master (tkinter.Misc): The window the dashboard is embedded in.
+        count (int): The number of pies.
+        columns (int): The number of pies in one row.
+        fontsize (int): The font size of the labels in the middle of the pies and of the titles.
+        """
+        self.fig = Figure()
+        self.fontsize = fontsize
+        rows = math.ceil(count / columns)
+        self._pies = []
+        for idx in range(count):
+            ax = self.fig.add_subplot(rows, columns, idx + 1)
+            wedges, _ = ax.pie([0, 100], startangle=START_ANGLE, colors=[VISITED_COLOR, NOT_VISITED_COLOR])
+            ax.axis('equal')
+            label = ax.text(0, 0, "", ha='center', va='center', fontsize=fontsize, color='black', weight='bold')
+            self._pies.append((ax, wedges, label))
+
+        self.canvas = FigureCanvasTkAgg(self.fig, master=master)
+        self.widget = self.canvas.get_tk_widget()
+
+    def update(self, values):
+        """
+        Show new percentages, pies without a value (None or missing at the end) are hidden.
+
+        Parameters:
+        values (list): Tuples (title, label, percentage) for the pies in the order of the grid.
+
+        Returns:
+        None
+        """
+        for idx, (ax, (visited_wedge, rest_wedge), label) in enumerate(self._pies):
+            if idx >= len(values) or values[idx] is None:
+                ax.set_visible(False)
+                continue
+
+            title, text, percentage = values[idx]
+            end = START_ANGLE + 3.6 * min(max(percentage, 0.0), 100.0)
+            visited_wedge.set_theta1(START_ANGLE)
+            visited_wedge.set_theta2(end)
+            rest_wedge.set_theta1(end)
+            rest_wedge.set_theta2(START_ANGLE + 360)
+            ax.set_title(title, fontsize=self.fontsize)
+            label.set_text(text)
+            ax.set_visible(True)
+        self.canvas.draw_idle()
+
+    def is_shown(self):
+        """
+        Return False while the window with the dashboard is hidden (or once it was destroyed).
+        """
+        try:
+            return bool(self.widget.winfo_viewable())
+        except tk.TclError:
+            return False
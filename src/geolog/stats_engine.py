@@ -0,0 +1,55 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+
+class Coverage(NamedTuple):
+    """
+    Numbers of visited obce of one user.
+
+    visited, total - in the whole ČR
+    kraj_visited, okres_visited - per kraj/okres, indexed by the region codes of CoverageStats
+    """
+    visited: int
+    total: int
+    kraj_visited: np.ndarray
+    okres_visited: np.ndarray
+
+
+class CoverageStats:
+    """
+    Counts the visited obce in the whole ČR, in every kraj and in every okres.
+
+    Every obec gets an integer code of its kraj and okres once, the visited obce of all
+    regions are then counted in one pass by np.bincount over the visited mask.
+    """
+
+    def __init__(self, obce_gdf, kraj_column, okres_column):
+        """
+        Parameters:
+        obce_gdf (geopandas.GeoDataFrame): The obce layer with 'kod_obce' column.
+        kraj_column (str): The kraj name attribute of obce.
+        okres_column (str): The okres name attribute of obce.
+        """
+        obce = obce_gdf.drop_duplicates('kod_obce')
+        self.kody = obce['kod_obce'].to_numpy(dtype=np.int64)
+        self.kraj_codes, self.kraje = pd.factorize(obce[kraj_column])
+        self.okres_codes, self.okresy = pd.factorize(obce[okres_column])
+        self.kraj_totals = np.bincount(self.kraj_codes, minlength=len(self.kraje))
+        self.okres_totals = np.bincount(self.okres_codes, minlength=len(self.okresy))
+
+    def coverage(self, visited_ids):
+        """
+        Count the visited obce in the whole ČR and in every kraj and okres.
+
+        Parameters:
+        visited_ids (array-like): kod_obce of the visited obce.
+
+        Returns:
+        Coverage: The visited counts.
+        """
+        visited = np.isin(self.kody, np.asarray(visited_ids, dtype=np.int64))
+        return Coverage(int(np.count_nonzero(visited)), len(self.kody),
+                        np.bincount(self.kraj_codes[visited], minlength=len(self.kraje)),
+                        np.bincount(self.okres_codes[visited], minlength=len(self.okresy)))
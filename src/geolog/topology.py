@@ -0,0 +1,113 @@
+import numpy as np
+import shapely
+
+# Version of build_arcs, increased with every change of the arcs it builds so that the cached arcs are rebuilt
+ARCS_VERSION = 1
+
+# Administrative level of an arc - the highest level of the border it belongs to
+LEVEL_OBEC = 0
+LEVEL_OKRES = 1
+LEVEL_KRAJ = 2
+
+# Feature index of the missing neighbour (arc on the state border)
+NO_NEIGHBOUR = -1
+# Vertices closer than this (metres) are considered identical when matching shared edges
+SNAP_GRID = 0.01
+# Minimal share of obce with a shared edge, fewer mean the obce do not share the vertices of their borders
+MIN_NEIGHBOUR_SHARE = 0.5
+
+
+def build_arcs(geometries, okresy, kraje):
+    """
+    Build the topology of unique arcs of the obce boundaries (as TopoJSON does).
+
+    Every edge shared by two neighbouring obce is kept only once. Consecutive edges of a ring
+    with the same neighbour are joined into one arc, which is tagged with the highest
+    administrative level of the border it lies on (state and kraj border, okres border or
+    just obec border).
+
+    Parameters:
+    geometries (array-like): The (Multi)Polygons of obce, they have to share the vertices of common borders.
+    okresy (array-like): The okres (name or integer code) of each obec.
+    kraje (array-like): The kraj (name or integer code) of each obec.
+
+    Returns:
+    tuple: (lines, level, left, right) - numpy.ndarray of LineStrings of the arcs, their level
+    (LEVEL_OBEC, LEVEL_OKRES or LEVEL_KRAJ) and the index of the obec on both sides of each arc
+    (right is NO_NEIGHBOUR on the state border).
+
+    Raises:
+    ValueError: If less than MIN_NEIGHBOUR_SHARE of the obce share an edge with a neighbour - the borders
+                would all be tagged as the state border.
+    """
+    okresy = np.asarray(okresy)
+    kraje = np.asarray(kraje)
+
+    # all rings with the index of their obec
+    polygons, polygon_feature = shapely.get_parts(np.asarray(geometries), return_index=True)
+    rings, ring_polygon = shapely.get_rings(polygons, return_index=True)
+    coords, coord_ring = shapely.get_coordinates(rings, return_index=True)
+
+    # edges between consecutive vertices of the same ring
+    in_ring = coord_ring[:-1] == coord_ring[1:]
+    start = coords[:-1][in_ring]
+    end = coords[1:][in_ring]
+    edge_ring = coord_ring[:-1][in_ring]
+    edge_feature = polygon_feature[ring_polygon[edge_ring]]
+
+    # edges are identified by both (snapped) end points regardless of their direction
+    start_key = np.round(start / SNAP_GRID).astype(np.int64)
+    end_key = np.round(end / SNAP_GRID).astype(np.int64)
+    swap = (start_key[:, 0] > end_key[:, 0]) | ((start_key[:, 0] == end_key[:, 0]) & (start_key[:, 1] > end_key[:, 1]))
+    keys = np.where(swap[:, None], np.hstack((end_key, start_key)), np.hstack((start_key, end_key)))
+    not_degenerate = np.any(start_key != end_key, axis=1)
+    _, edge_id = np.unique(keys, axis=0, return_inverse=True)
+    edge_id = edge_id.ravel()
+
+    # the neighbour of an edge is the other obec with the same edge
+    order = np.argsort(edge_id, kind='stable')
+    sorted_id = edge_id[order]
+    first_in_group = np.concatenate(([True], sorted_id[1:] != sorted_id[:-1]))
+    has_pair = np.concatenate((sorted_id[1:] == sorted_id[:-1], [False])) & first_in_group
+    neighbour = np.full(len(edge_id), NO_NEIGHBOUR, dtype=np.int64)
+    pair = np.flatnonzero(has_pair)
+    neighbour[order[pair]] = edge_feature[order[pair + 1]]
+    neighbour[order[pair + 1]] = edge_feature[order[pair]]
+
+    count = len(np.unique(polygon_feature))
+    with_neighbour = len(np.unique(edge_feature[neighbour != NO_NEIGHBOUR]))
+    if count > 1 and with_neighbour < MIN_NEIGHBOUR_SHARE * count:
+        raise ValueError(f"only {with_neighbour} of {count} obce share the vertices of an edge with a neighbour")
+
+    # keep the first occurence of every edge only
+    keep = np.zeros(len(edge_id), dtype=bool)
+    keep[order[first_in_group]] = True
+    keep &= not_degenerate
+    kept = np.flatnonzero(keep)
+
+    left = edge_feature[kept]
+    right = neighbour[kept]
+
+    # consecutive edges of one ring with the same neighbour form one arc
+    new_arc = np.ones(len(kept), dtype=bool)
+    new_arc[1:] = ((kept[1:] != kept[:-1] + 1) | (edge_ring[kept[1:]] != edge_ring[kept[:-1]]) |
+                   (right[1:] != right[:-1]))
+    arc_of_edge = np.cumsum(new_arc) - 1
+    arc_start = np.flatnonzero(new_arc)
+    arc_end = np.append(arc_start[1:], len(kept)) - 1
+
+    # vertices of the arcs - start of every edge and the end of the last edge of each arc
+    arc_coords = np.empty((len(kept) + len(arc_start), 2))
+    arc_coords[np.arange(len(kept)) + arc_of_edge] = start[kept]
+    arc_coords[arc_end + np.arange(len(arc_start)) + 1] = end[kept[arc_end]]
+    arc_index = np.repeat(np.arange(len(arc_start)), arc_end - arc_start + 2)
+    lines = shapely.linestrings(arc_coords, indices=arc_index)
+
+    left = left[arc_start]
+    right = right[arc_start]
+    level = np.full(len(arc_start), LEVEL_OBEC, dtype=np.int8)
+    border = right != NO_NEIGHBOUR
+    level[border & (okresy[left] != okresy[np.where(border, right, left)])] = LEVEL_OKRES
+    level[border & (kraje[left] != kraje[np.where(border, right, left)])] = LEVEL_KRAJ
+    level[~border] = LEVEL_KRAJ
+    return lines, level, left, right
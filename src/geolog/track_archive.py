@@ -0,0 +1,276 @@
+import base64
+import itertools
+import os
+import sqlite3
+import zlib
+from contextlib import closing
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from gpx_stream import add_first_visits, CHUNK_SIZE, merge_first_visits, MODE_SEGMENTS
+
+# Directory of the GeoPackages with the tracks of every user
+ARCHIVE_DIRECTORY = os.path.join("database", "tracks")
+LAYER = "tracks"
+CRS = "EPSG:5514"
+# Maximal number of points of one stored line, longer segments are split so that bbox queries stay selective
+PIECE_POINTS = 2000
+# Number of rows written to or read from an archive at once, the rows of a track are never all kept in memory
+BATCH_ROWS = 100
+# Points closer than this (metres along the track) to the last kept point are dropped (GPS noise when standing)
+MIN_STEP = 5.0
+# Stored instead of the time of a point without time
+NO_TIME = np.iinfo(np.int32).min
+
+
+def _thin(x, y):
+    """
+    Return the indices of the kept points - the first, the last and the first point of every MIN_STEP along the track.
+    """
+    distance = np.concatenate(([0.0], np.cumsum(np.hypot(np.diff(x), np.diff(y)))))
+    step = np.floor(distance / MIN_STEP)
+    keep = np.flatnonzero(np.concatenate(([True], step[1:] != step[:-1])))
+    if keep[-1] != len(x) - 1:
+        keep = np.append(keep, len(x) - 1)
+    return keep
+
+
+def _encode_times(time):
+    """
+    Return the first and the last time (ISO strings, None without times) and the compressed
+    seconds of every point since the first time (NO_TIME for points without time).
+    The compressed seconds are Base64 text, OGR does not write binary fields of GeoPackages.
+    """
+    valid = ~np.isnat(time)
+    if valid.any():
+        start, end = time[valid].min(), time[valid].max()
+        seconds = np.where(valid, (time - start).astype(np.int64), NO_TIME).astype(np.int32)
+        start, end = str(start), str(end)
+    else:
+        start, end = None, None
+        seconds = np.full(len(time), NO_TIME, dtype=np.int32)
+    return start, end, base64.b64encode(zlib.compress(seconds.tobytes())).decode("ascii")
+
+
+def _decode_times(start, times):
+    """
+    Return the times of the points (datetime64[s], NaT without time) stored by _encode_times.
+    """
+    seconds = np.frombuffer(zlib.decompress(base64.b64decode(times)), dtype=np.int32)
+    if start is None or start != start:
+        return np.full(len(seconds), np.datetime64("NaT"), dtype="datetime64[s]")
+    time = np.datetime64(start, "s") + seconds.astype("timedelta64[s]")
+    time[seconds == NO_TIME] = np.datetime64("NaT")
+    return time
+
+
+def _time_bound(value, end=False):
+    """
+    Return the ISO string of the time bound, a date as the upper bound means the end of the day.
+    """
+    value = np.datetime64(value)
+    if end and value.dtype == np.dtype("datetime64[D]"):
+        value = value + np.timedelta64(1, "D") - np.timedelta64(1, "s")
+    return str(value.astype("datetime64[s]"))
+
+
+class TrackCollector:
+    """
+    Collects the track points of one GPX file (on_chunk of gpx_stream.first_visits) as the rows of the archive.
+
+    Every track segment is thinned (see MIN_STEP) and split into lines of at most PIECE_POINTS points,
+    neighbouring lines share their end point. The times of the points are stored with each line
+    as compressed seconds since its first point. The rows are written to the archive in batches
+    of BATCH_ROWS, flush() writes the rest.
+    """
+
+    def __init__(self, track, archive):
+        """
+        Parameters:
+        track (str): The name of the track (of the GPX file).
+        archive (TrackArchive): The archive the rows are written to, usually a staging archive.
+        """
+        self.track = track
+        self.archive = archive
+        self.rows = []
+        self._previous = None
+
+    def __call__(self, x, y, time, segment):
+        # continue the segment split between two chunks from the last point of the previous chunk
+        if self._previous is not None and self._previous[3] == segment[0]:
+            x, y, time, segment = (np.concatenate(([p], a)) for p, a in zip(self._previous, (x, y, time, segment)))
+        self._previous = (x[-1], y[-1], time[-1], segment[-1])
+
+        starts = np.flatnonzero(np.concatenate(([True], segment[1:] != segment[:-1])))
+        for start, end in zip(starts, np.append(starts[1:], len(x))):
+            kept = start + _thin(x[start:end], y[start:end])
+            for first in range(0, max(len(kept) - 1, 1), PIECE_POINTS - 1):
+                piece = kept[first:first + PIECE_POINTS]
+                if len(piece) == 1:
+                    # a single point is stored as a line of zero length
+                    piece = np.repeat(piece, 2)
+                start_time, end_time, times = _encode_times(time[piece])
+                self.rows.append({"track": self.track, "segment": int(segment[start]), "start_time": start_time,
+                                  "end_time": end_time, "times": times,
+                                  "geometry": shapely.linestrings(x[piece], y[piece])})
+        if len(self.rows) >= BATCH_ROWS:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the collected rows to the archive.
+        """
+        self.archive.add(self.rows)
+        self.rows = []
+
+
+class TrackArchive:
+    """
+    The tracks imported by one user, stored in a GeoPackage (one file per user) in S-JTSK.
+
+    The lines are found by the R-tree spatial index of the GeoPackage (bbox) and by an index
+    of their first and last time, so the obce visited by all tracks can be found again
+    (e.g. after the obce were updated) without the GPX files.
+
+    An import writes the track to a staging archive first (staging()), it is moved to the archive
+    of the user by append() once the whole file was read, so a failed import leaves no partial track.
+    """
+
+    def __init__(self, user, directory=ARCHIVE_DIRECTORY):
+        """
+        Parameters:
+        user (str): The name of the user.
+        directory (str): The directory with the GeoPackages of all users.
+        """
+        self.user = user
+        self.directory = directory
+        self.path = os.path.join(directory, user + ".gpkg")
+
+    def add(self, rows):
+        """
+        Store the rows of a track (TrackCollector.rows or a GeoDataFrame read from another archive).
+        """
+        if not len(rows):
+            return
+        exists = os.path.exists(self.path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        gdf = gpd.GeoDataFrame(rows, geometry="geometry", crs=CRS)
+        gdf.to_file(self.path, layer=LAYER, driver="GPKG", mode="a" if exists else "w", SPATIAL_INDEX="YES")
+        if not exists:
+            with closing(sqlite3.connect(self.path)) as conn, conn:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {LAYER}_time ON {LAYER} (start_time, end_time)")
+
+    def staging(self, key):
+        """
+        Return an empty temporary archive for the track of one import, unique per process and key.
+        """
+        staging = TrackArchive(f"{self.user}.{os.getpid()}.{key}.tmp", self.directory)
+        staging.remove()
+        return staging
+
+    def append(self, staging):
+        """
+        Move the lines of the staging archive to this archive in batches of BATCH_ROWS
+        and delete the staging archive.
+        """
+        for lines in staging.batches():
+            self.add(lines)
+        staging.remove()
+
+    def batches(self):
+        """
+        Return an iterator over all stored lines in GeoDataFrames of at most BATCH_ROWS lines.
+        """
+        if not os.path.exists(self.path):
+            return
+        for start in itertools.count(0, BATCH_ROWS):
+            lines = gpd.read_file(self.path, layer=LAYER, rows=slice(start, start + BATCH_ROWS))
+            if lines.empty:
+                break
+            yield lines
+
+    def remove(self):
+        """
+        Delete the archive of the user.
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def query(self, bbox=None, time_from=None, time_to=None):
+        """
+        Return the stored lines intersecting the bbox and the time range.
+
+        Parameters:
+        bbox (tuple): (minx, miny, maxx, maxy) in S-JTSK, None for all lines.
+        time_from (str): The first time (ISO date or date and time), None for no limit.
+        time_to (str): The last time (a date means its end), None for no limit.
+
+        Returns:
+        geopandas.GeoDataFrame: The lines with columns track, segment, start_time, end_time and times.
+        """
+        if not os.path.exists(self.path):
+            return gpd.GeoDataFrame(columns=["track", "segment", "start_time", "end_time", "times", "geometry"],
+                                    geometry="geometry", crs=CRS)
+        where = []
+        if time_from is not None:
+            where.append(f"end_time >= '{_time_bound(time_from)}'")
+        if time_to is not None:
+            where.append(f"start_time <= '{_time_bound(time_to, end=True)}'")
+        return gpd.read_file(self.path, layer=LAYER, bbox=bbox, where=" AND ".join(where) or None)
+
+    def points(self, lines):
+        """
+        Return the points of the lines (query()) as arrays x, y, time (datetime64[s]) and the line index.
+        """
+        coords, line_idx = shapely.get_coordinates(lines.geometry.values, return_index=True)
+        time = np.concatenate([_decode_times(start, times)
+                               for start, times in zip(lines["start_time"], lines["times"])])
+        return coords[:, 0], coords[:, 1], time.astype("datetime64[s]"), line_idx
+
+    def rematch(self, geocoder, mode=MODE_SEGMENTS, chunk_size=CHUNK_SIZE):
+        """
+        Find the obce visited by all stored tracks with the date of the first visit.
+
+        The lines are read and matched in batches of BATCH_ROWS, the first visits of the batches are merged,
+        so the memory used does not depend on the size of the archive.
+
+        Parameters:
+        geocoder (ReverseGeocoder): The spatial index of (new) obce.
+        mode (str): MODE_POINTS or MODE_SEGMENTS, see gpx_stream.first_visits.
+        chunk_size (int): Approximate number of points matched at once.
+
+        Returns:
+        dict: {kod_obce (int): date of the first visit (str yyyy-mm-dd or None)}.
+        """
+        visits = {}
+        for lines in self.batches():
+            merge_first_visits(visits, self._match(lines, geocoder, mode, chunk_size))
+        return visits
+
+    def _match(self, lines, geocoder, mode, chunk_size):
+        """
+        Return the first visits {kod_obce: date} of the lines (query() or batches()).
+        """
+        lines = lines.sort_values("start_time", na_position="last", kind="stable").reset_index(drop=True)
+        x, y, time, line_idx = self.points(lines)
+
+        # the repeated point of a single point line is dropped, the point is then matched as a point
+        keep = np.concatenate(([True], (line_idx[1:] != line_idx[:-1]) | (x[1:] != x[:-1]) | (y[1:] != y[:-1])))
+        x, y, time, line_idx = x[keep], y[keep], time[keep], line_idx[keep]
+
+        # the points are matched in chunks of whole lines
+        starts = np.flatnonzero(np.concatenate(([True], line_idx[1:] != line_idx[:-1])))
+        cuts = starts[np.searchsorted(starts, np.arange(chunk_size, len(x), chunk_size), side="right") - 1]
+        cuts = np.unique(np.concatenate(([0], cuts, [len(x)])))
+
+        visits = {}
+        for first, last in zip(cuts[:-1], cuts[1:]):
+            part = slice(first, last)
+            if mode == MODE_SEGMENTS:
+                kody, times = geocoder.crossings(x[part], y[part], time[part], line_idx[part])
+            else:
+                kody, times = geocoder.lookup(x[part], y[part]), time[part]
+            add_first_visits(visits, kody, times)
+        return visits
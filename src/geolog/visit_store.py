@@ -0,0 +1,547 @@
+import json
+import sqlite3
+from typing import NamedTuple
+
+import numpy as np
+
+# Tables of the normalized schema, a table with obecID column is a legacy per-user table
+STORE_TABLES = ("users", "visits", "coverage", "gazetteer", "imports")
+# Legacy per-user tables named like a table of the schema get this prefix before the schema is created,
+# the old user names were alphanumeric, so a prefixed name cannot be a user
+LEGACY_PREFIX = "legacy_"
+
+# Levels of the coverage counters, the whole ČR is one region named COUNTRY
+COVERAGE_STAT = "stat"
+COVERAGE_KRAJ = "kraj"
+COVERAGE_OKRES = "okres"
+COUNTRY = "ČR"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS visits (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    obec_id INTEGER NOT NULL,
+    dat DATE
+);
+CREATE UNIQUE INDEX IF NOT EXISTS visits_user_obec ON visits (user_id, obec_id);
+CREATE INDEX IF NOT EXISTS visits_user_dat ON visits (user_id, dat);
+CREATE TABLE IF NOT EXISTS coverage (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    level TEXT NOT NULL,
+    region TEXT NOT NULL,
+    visited INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    PRIMARY KEY (user_id, level, region)
+);
+CREATE INDEX IF NOT EXISTS coverage_rank ON coverage (user_id, level, visited * 1.0 / total DESC);
+CREATE TABLE IF NOT EXISTS gazetteer (
+    kod_obce INTEGER PRIMARY KEY,
+    nazev_obce TEXT NOT NULL,
+    nazev_okre TEXT NOT NULL,
+    nazev_kraj TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS imports (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    points INTEGER NOT NULL,
+    resume_offset INTEGER NOT NULL,
+    resume_sha256 TEXT NOT NULL,
+    matches TEXT NOT NULL,
+    PRIMARY KEY (user_id, path, mode)
+);
+CREATE INDEX IF NOT EXISTS imports_user_sha256 ON imports (user_id, sha256, mode);
+"""
+
+# Subquery selecting the id of the user given by name
+_USER_ID = "(SELECT id FROM users WHERE name = ?)"
+
+
+class ImportRecord(NamedTuple):
+    """
+    Ledger entry of a GPX file imported by a user.
+
+    size, sha256 - size and content hash of the whole file
+    points - the number of track points in the file
+    resume_offset, resume_sha256 - byte offset of the last track point and hash of the bytes before it,
+                                   a file with the same bytes before the offset only has new points appended
+    matches - {kod_obce: date of the first visit} found in the file
+    """
+    path: str
+    mode: str
+    size: int
+    sha256: str
+    points: int
+    resume_offset: int
+    resume_sha256: str
+    matches: dict
+
+
+_IMPORT_COLUMNS = "path, mode, size, sha256, points, resume_offset, resume_sha256, matches"
+
+
+def _import_record(row):
+    if row is None:
+        return None
+    matches = {int(obec_id): date for obec_id, date in json.loads(row[-1]).items()}
+    return ImportRecord(*row[:-1], matches)
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _region_counts(stats, coverage):
+    """
+    Yield (level, region, visited, total) of the whole ČR and all kraje and okresy.
+    """
+    yield COVERAGE_STAT, COUNTRY, coverage.visited, coverage.total
+    for regions, visited, totals, level in ((stats.kraje, coverage.kraj_visited, stats.kraj_totals, COVERAGE_KRAJ),
+                                            (stats.okresy, coverage.okres_visited, stats.okres_totals, COVERAGE_OKRES)):
+        for region, region_visited, total in zip(regions, visited.tolist(), totals.tolist()):
+            yield level, region, region_visited, total
+
+
+class VisitedSet:
+    """
+    Obce visited by one user, kept in memory.
+
+    A set answers membership tests, a sorted NumPy array of kod_obce (rebuilt lazily after
+    a change) serves the vectorized consumers (map coloring, statistics).
+    """
+
+    def __init__(self, obec_ids=()):
+        self._ids = set(int(obec_id) for obec_id in obec_ids)
+        self._array = None
+
+    def __contains__(self, obec_id):
+        return int(obec_id) in self._ids
+
+    @property
+    def array(self):
+        """
+        numpy.ndarray: Sorted kod_obce (int64) of the visited obce.
+        """
+        if self._array is None:
+            self._array = np.fromiter(sorted(self._ids), dtype=np.int64, count=len(self._ids))
+        return self._array
+
+    def update(self, obec_ids):
+        self._ids.update(int(obec_id) for obec_id in obec_ids)
+        self._array = None
+
+    def discard(self, obec_id):
+        self._ids.discard(int(obec_id))
+        self._array = None
+
+
+class VisitStore:
+    """
+    SQLite store of users and obce visited by them.
+
+    All visits are kept in a single table indexed by (user, obec) and (user, date), so checks
+    whether an obec was already visited and date filters are answered by the index.
+    Every change is committed at once.
+
+    The obce visited by the current user are cached in a VisitedSet, which is updated
+    together with the database (write-through) and read again only when the user changes.
+
+    Once the regions of obce are known (set_regions), the numbers of visited obce in the whole
+    ČR, in every kraj and every okres are kept in the coverage table. They are updated by delta
+    in the same transaction as the visits, so statistics and rankings are simple indexed reads.
+
+    The imports table is the ledger of the imported GPX files with the obce found in them (see gpx_ledger).
+    """
+
+    def __init__(self, path):
+        """
+        Open the database, create the schema and migrate the legacy per-user tables.
+
+        Parameters:
+        path (str): The path to the SQLite database file.
+        """
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        # (name of the user, VisitedSet) of the last user asked for
+        self._visited = None
+        # stats_engine.CoverageStats with the regions of obce, None until set_regions
+        self._stats = None
+        self._rename_legacy_tables()
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+        self._migrate_legacy_tables()
+
+    def close(self):
+        self.conn.close()
+
+    def _legacy_tables(self):
+        """
+        Return (name, columns) of the old tables named after the users, recognized by their obecID column.
+        """
+        tables = self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' "
+                                   "AND name NOT LIKE 'sqlite_%' ORDER BY rowid").fetchall()
+        legacy = []
+        for table, in tables:
+            columns = [row[1] for row in self.conn.execute(f"PRAGMA table_info({_quote(table)})")]
+            if "obecID" in columns:
+                legacy.append((table, columns))
+        return legacy
+
+    def _rename_legacy_tables(self):
+        """
+        Rename the old tables of users named like a table of the schema (e.g. "visits"),
+        so that the schema can be created. They are migrated by _migrate_legacy_tables.
+        """
+        with self.conn:
+            for table, _ in self._legacy_tables():
+                if table in STORE_TABLES:
+                    self.conn.execute(f"ALTER TABLE {_quote(table)} RENAME TO {_quote(LEGACY_PREFIX + table)}")
+
+    def _migrate_legacy_tables(self):
+        """
+        Move the visits from the old tables named after the users (id, obecID[, dat]) to the visits table
+        and drop the old tables. Runs once, in one transaction.
+        """
+        with self.conn:
+            for table, columns in self._legacy_tables():
+                name = table[len(LEGACY_PREFIX):] if table.startswith(LEGACY_PREFIX) else table
+                # the oldest tables have no date column
+                date_column = "dat" if "dat" in columns else "NULL"
+
+                self.conn.execute("INSERT OR IGNORE INTO users (name) VALUES (?)", (name,))
+                self.conn.execute(f"INSERT OR IGNORE INTO visits (user_id, obec_id, dat) "
+                                  f"SELECT {_USER_ID}, CAST(obecID AS INTEGER), {date_column} "
+                                  f"FROM {_quote(table)} ORDER BY id", (name,))
+                self.conn.execute(f"DROP TABLE {_quote(table)}")
+                print("uzivatel preveden: " + name)
+
+    def users(self):
+        """
+        Return the names of all users in the order of creation.
+        """
+        return [name for name, in self.conn.execute("SELECT name FROM users ORDER BY id")]
+
+    def add_user(self, name):
+        """
+        Create a new user.
+
+        Parameters:
+        name (str): The name of the user.
+
+        Returns:
+        bool: False if the user already exists.
+        """
+        with self.conn:
+            cursor = self.conn.execute("INSERT OR IGNORE INTO users (name) VALUES (?)", (name,))
+            if cursor.rowcount > 0:
+                self._rebuild_coverage(cursor.lastrowid)
+        return cursor.rowcount > 0
+
+    def remove_user(self, name):
+        """
+        Remove the user with all the visits.
+        """
+        with self.conn:
+            self.conn.execute(f"DELETE FROM visits WHERE user_id = {_USER_ID}", (name,))
+            self.conn.execute(f"DELETE FROM coverage WHERE user_id = {_USER_ID}", (name,))
+            self.conn.execute(f"DELETE FROM imports WHERE user_id = {_USER_ID}", (name,))
+            self.conn.execute("DELETE FROM users WHERE name = ?", (name,))
+        if self._cached(name) is not None:
+            self._visited = None
+
+    def _cached(self, name):
+        """
+        Return the cached VisitedSet if it belongs to the user, otherwise None.
+        """
+        if self._visited is not None and self._visited[0] == name:
+            return self._visited[1]
+        return None
+
+    def visited(self, name):
+        """
+        Return the obce visited by the user. The database is read only when the user changes.
+
+        Parameters:
+        name (str): The name of the user.
+
+        Returns:
+        VisitedSet: The visited obce, do not modify it - it is updated by the store.
+        """
+        visited = self._cached(name)
+        if visited is None:
+            rows = self.conn.execute(f"SELECT obec_id FROM visits WHERE user_id = {_USER_ID}", (name,))
+            visited = VisitedSet(obec_id for obec_id, in rows)
+            self._visited = (name, visited)
+        return visited
+
+    def visited_ids(self, name):
+        """
+        Return kod_obce of all obce visited by the user.
+
+        Parameters:
+        name (str): The name of the user.
+
+        Returns:
+        numpy.ndarray: Sorted kod_obce (int64) of the visited obce.
+        """
+        return self.visited(name).array
+
+    def add_visit(self, name, obec_id, date):
+        """
+        Record the visit of the obec, an obec already visited by the user is not added again.
+
+        Parameters:
+        name (str): The name of the user.
+        obec_id (int): kod_obce of the visited obec.
+        date (str): The date of the visit (yyyy-mm-dd) or None.
+
+        Returns:
+        bool: False if the obec was already visited by the user.
+        """
+        visited = self._cached(name)
+        if visited is not None and obec_id in visited:
+            return False
+
+        with self.conn:
+            cursor = self.conn.execute(f"INSERT OR IGNORE INTO visits (user_id, obec_id, dat) "
+                                       f"VALUES ({_USER_ID}, ?, ?)", (name, int(obec_id), date))
+            if cursor.rowcount > 0:
+                self._update_coverage(name, [obec_id], 1)
+        if visited is not None:
+            visited.update([obec_id])
+        return cursor.rowcount > 0
+
+    def add_visits(self, name, visits):
+        """
+        Record many visits at once (e.g. from a GPX track) in a single transaction.
+        Obce already visited by the user are skipped by the unique (user, obec) index.
+
+        Parameters:
+        name (str): The name of the user.
+        visits (iterable): Pairs (kod_obce, date of the first visit as yyyy-mm-dd or None).
+
+        Returns:
+        int: The number of visits added.
+        """
+        user_id = self.conn.execute("SELECT id FROM users WHERE name = ?", (name,)).fetchone()
+        if user_id is None:
+            return 0
+
+        # the obce visited before are skipped (first occurence of an obec is used)
+        visited = self.visited(name)
+        new_visits = {}
+        for obec_id, date in visits:
+            if obec_id not in visited:
+                new_visits.setdefault(int(obec_id), date)
+
+        # Only the rows really inserted change the coverage counters and the cache - another
+        # process (batch import) may have added some of the obce since the cache was read.
+        # The write lock is held from the first insert to the commit, so the inserted rows got
+        # the highest ids of the table (ids of INTEGER PRIMARY KEY grow by one from the maximum).
+        with self.conn:
+            cursor = self.conn.executemany("INSERT OR IGNORE INTO visits (user_id, obec_id, dat) VALUES (?, ?, ?)",
+                                           [(user_id[0], obec_id, date) for obec_id, date in new_visits.items()])
+            inserted = max(cursor.rowcount, 0)
+            added = [row[0] for row in self.conn.execute("SELECT obec_id FROM visits ORDER BY id DESC LIMIT ?",
+                                                         (inserted,))]
+            self._update_coverage(name, added, 1)
+
+        visited.update(added)
+        return len(added)
+
+    def remove_visit(self, name, obec_id):
+        """
+        Remove the visit of the obec.
+        """
+        with self.conn:
+            cursor = self.conn.execute(f"DELETE FROM visits WHERE user_id = {_USER_ID} AND obec_id = ?",
+                                       (name, int(obec_id)))
+            if cursor.rowcount > 0:
+                self._update_coverage(name, [obec_id], -1)
+        visited = self._cached(name)
+        if visited is not None:
+            visited.discard(obec_id)
+
+    def find_import(self, name, sha256, mode):
+        """
+        Return the ledger entry of a file with the same content imported by the user, None if there is none.
+        """
+        row = self.conn.execute(f"SELECT {_IMPORT_COLUMNS} FROM imports "
+                                f"WHERE user_id = {_USER_ID} AND sha256 = ? AND mode = ?",
+                                (name, sha256, mode)).fetchone()
+        return _import_record(row)
+
+    def last_import(self, name, path, mode):
+        """
+        Return the ledger entry of the last import of the file from the path by the user, None if there is none.
+        """
+        row = self.conn.execute(f"SELECT {_IMPORT_COLUMNS} FROM imports "
+                                f"WHERE user_id = {_USER_ID} AND path = ? AND mode = ?",
+                                (name, path, mode)).fetchone()
+        return _import_record(row)
+
+    def record_import(self, name, record):
+        """
+        Store the ledger entry of an imported file, it replaces the entry of the previous import from the path.
+
+        Parameters:
+        name (str): The name of the user.
+        record (ImportRecord): The imported file.
+        """
+        values = record._replace(matches=json.dumps({str(obec_id): date for obec_id, date in record.matches.items()}))
+        with self.conn:
+            self.conn.execute(f"INSERT OR REPLACE INTO imports (user_id, {_IMPORT_COLUMNS}) "
+                              f"VALUES ({_USER_ID}, ?, ?, ?, ?, ?, ?, ?, ?)", (name, *values))
+
+    def set_gazetteer(self, rows):
+        """
+        Store the names of all obce, so that the visits can be joined with them.
+        The table is rewritten only when the names changed.
+
+        Parameters:
+        rows (iterable): Tuples (kod_obce, nazev_obce, nazev_okre, nazev_kraj).
+
+        Returns:
+        bool: True if the table was rewritten.
+        """
+        rows = sorted((int(kod), nazev_obce, nazev_okre, nazev_kraj)
+                      for kod, nazev_obce, nazev_okre, nazev_kraj in rows)
+        stored = self.conn.execute("SELECT kod_obce, nazev_obce, nazev_okre, nazev_kraj FROM gazetteer "
+                                   "ORDER BY kod_obce").fetchall()
+        if stored == rows:
+            return False
+
+        with self.conn:
+            self.conn.execute("DELETE FROM gazetteer")
+            self.conn.executemany("INSERT OR REPLACE INTO gazetteer (kod_obce, nazev_obce, nazev_okre, nazev_kraj) "
+                                  "VALUES (?, ?, ?, ?)", rows)
+        return True
+
+    def visits_between(self, name, date_from, date_to):
+        """
+        Return the visits of the user between two dates (both included), ordered by date,
+        with the names of the obce from the gazetteer. Uses the (user, date) index.
+
+        Parameters:
+        name (str): The name of the user.
+        date_from (str): The first date (yyyy-mm-dd).
+        date_to (str): The last date (yyyy-mm-dd).
+
+        Returns:
+        list: Tuples (date as dd-mm-yyyy, nazev_obce, nazev_okre), obce missing in the gazetteer
+        have kod_obce instead of the name.
+        """
+        query = (f"SELECT strftime('%d-%m-%Y', v.dat), COALESCE(g.nazev_obce, v.obec_id), "
+                 f"COALESCE(g.nazev_okre, '') "
+                 f"FROM visits AS v LEFT JOIN gazetteer AS g ON g.kod_obce = v.obec_id "
+                 f"WHERE v.user_id = {_USER_ID} AND v.dat BETWEEN ? AND ? ORDER BY v.dat")
+        return self.conn.execute(query, (name, date_from, date_to)).fetchall()
+
+    def set_regions(self, stats):
+        """
+        Set the kraj and okres of every obec used by the coverage counters
+        and rebuild the counters which do not match the visits.
+
+        Parameters:
+        stats (stats_engine.CoverageStats): The region codes of obce.
+
+        Returns:
+        list: Names of the users whose counters were rebuilt.
+        """
+        self._stats = stats
+        return self.check_coverage(rebuild=True)
+
+    def _update_coverage(self, name, obec_ids, sign):
+        """
+        Add (sign 1) or subtract (sign -1) the obce to/from the coverage counters of the user.
+        Has to be called inside the transaction changing the visits.
+        """
+        if self._stats is None or not len(obec_ids):
+            return
+        delta = self._stats.coverage(obec_ids)
+        user_id = self.conn.execute("SELECT id FROM users WHERE name = ?", (name,)).fetchone()[0]
+        rows = [(user_id, level, region, sign * visited, total)
+                for level, region, visited, total in _region_counts(self._stats, delta) if visited]
+        self.conn.executemany("INSERT INTO coverage (user_id, level, region, visited, total) VALUES (?, ?, ?, ?, ?) "
+                              "ON CONFLICT (user_id, level, region) DO UPDATE SET visited = visited + excluded.visited",
+                              rows)
+
+    def _expected_coverage(self, user_id):
+        """
+        Return the coverage rows (level, region, visited, total) of the user computed from the visits.
+        """
+        rows = self.conn.execute("SELECT obec_id FROM visits WHERE user_id = ?", (user_id,))
+        coverage = self._stats.coverage([obec_id for obec_id, in rows])
+        return list(_region_counts(self._stats, coverage))
+
+    def _rebuild_coverage(self, user_id):
+        """
+        Compute the coverage counters of the user from the visits again.
+        Has to be called inside a transaction.
+        """
+        if self._stats is None:
+            return
+        self.conn.execute("DELETE FROM coverage WHERE user_id = ?", (user_id,))
+        self.conn.executemany("INSERT INTO coverage (user_id, level, region, visited, total) VALUES (?, ?, ?, ?, ?)",
+                              ((user_id,) + row for row in self._expected_coverage(user_id)))
+
+    def check_coverage(self, rebuild=False):
+        """
+        Compare the stored coverage counters of all users with the visits.
+
+        Parameters:
+        rebuild (bool): Rebuild the counters which do not match.
+
+        Returns:
+        list: Names of the users with inconsistent counters.
+        """
+        if self._stats is None:
+            return []
+
+        inconsistent = []
+        for user_id, name in self.conn.execute("SELECT id, name FROM users ORDER BY id").fetchall():
+            stored = self.conn.execute("SELECT level, region, visited, total FROM coverage WHERE user_id = ?",
+                                       (user_id,)).fetchall()
+            if set(stored) != set(self._expected_coverage(user_id)):
+                inconsistent.append(name)
+                if rebuild:
+                    with self.conn:
+                        self._rebuild_coverage(user_id)
+        return inconsistent
+
+    def coverage(self, name, level):
+        """
+        Return the percentage of obce visited by the user in every region of the level.
+
+        Parameters:
+        name (str): The name of the user.
+        level (str): COVERAGE_STAT (the whole ČR as region COUNTRY), COVERAGE_KRAJ or COVERAGE_OKRES.
+
+        Returns:
+        dict: {region name: percentage of visited obce}.
+        """
+        rows = self.conn.execute(f"SELECT region, visited, total FROM coverage WHERE user_id = {_USER_ID} "
+                                 f"AND level = ?", (name, level))
+        return {region: visited * 100.0 / total if total else 0.0 for region, visited, total in rows}
+
+    def top_regions(self, name, level, count=3):
+        """
+        Return the regions of the level with the highest percentage of obce visited by the user.
+
+        Parameters:
+        name (str): The name of the user.
+        level (str): COVERAGE_KRAJ or COVERAGE_OKRES.
+        count (int): The number of regions.
+
+        Returns:
+        dict: {region name: percentage of visited obce} ordered from the highest percentage.
+        """
+        rows = self.conn.execute(f"SELECT region, visited, total FROM coverage WHERE user_id = {_USER_ID} "
+                                 f"AND level = ? ORDER BY visited * 1.0 / total DESC LIMIT ?", (name, level, count))
+        return {region: visited * 100.0 / total for region, visited, total in rows}
@@ -0,0 +1,85 @@
+import tkinter as tk
+
+# using predefined theme - https://github.com/rdbende/Azure-ttk-theme/
+THEME_PATH = "files/azure.tcl"
+ICON_PATH = "files/ico.ico"
+
+
+class DialogManager:
+    """
+    Dialog windows of GeoLog created as Toplevels of the single root window.
+
+    The theme is loaded into the one Tcl interpreter only once. Every dialog is built with its
+    widgets the first time it is opened, closing it only hides it. Opening it again shows the
+    same window after refreshing the data it displays.
+    """
+
+    def __init__(self, root, theme="light"):
+        """
+        Parameters:
+        root (tkinter.Tk): The root Tkinter window, owner of all dialogs.
+        theme (str): The Azure theme variant ("light" or "dark").
+        """
+        self.root = root
+        root.tk.call("source", THEME_PATH)
+        root.tk.call("set_theme", theme)
+        self._dialogs = {}
+        self._refresh = {}
+
+    def show(self, name):
+        """
+        Show the dialog built before and refresh its content.
+
+        Parameters:
+        name (str): The name of the dialog.
+
+        Returns:
+        tkinter.Toplevel: The dialog window, None if the dialog was not built yet.
+        """
+        window = self._dialogs.get(name)
+        if window is None:
+            return None
+
+        window.deiconify()
+        window.lift()
+        refresh = self._refresh.get(name)
+        if refresh is not None:
+            refresh()
+        return window
+
+    def create(self, name, title, geometry=None, resizable=True):
+        """
+        Create a new (empty) dialog, closing it only hides it.
+
+        Parameters:
+        name (str): The name of the dialog used by show() and hide().
+        title (str): The window title.
+        geometry (str): The window size "<width>x<height>", None for the natural size.
+        resizable (bool): Whether the user can resize the window.
+
+        Returns:
+        tkinter.Toplevel: The dialog window.
+        """
+        window = tk.Toplevel(self.root)
+        window.title(title)
+        if geometry is not None:
+            window.geometry(geometry)
+        window.iconbitmap(ICON_PATH)
+        window.resizable(resizable, resizable)
+        window.protocol("WM_DELETE_WINDOW", window.withdraw)
+        self._dialogs[name] = window
+        return window
+
+    def on_show(self, name, refresh):
+        """
+        Register a function refreshing the content of the dialog, it is called on every show().
+        """
+        self._refresh[name] = refresh
+
+    def hide(self, name):
+        """
+        Hide the dialog, its widgets are kept for the next show().
+        """
+        window = self._dialogs.get(name)
+        if window is not None:
+            window.withdraw()
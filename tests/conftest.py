@@ -0,0 +1,84 @@
+import os
+import sys
+
+import geopandas as gpd
+import pytest
+import shapely
+from pyproj import Transformer
+
+# The modules of GeoLog import each other as top-level modules (the app is run from its directory)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "geolog"))
+
+from reverse_geocoder import ReverseGeocoder  # noqa: E402
+
+# Lower left corner (S-JTSK) and size of the square obce of the test layer
+ORIGIN_X = -740000.0
+ORIGIN_Y = -1045000.0
+CELL = 1000.0
+COLUMNS = 10
+
+
+def cell_center(column):
+    """
+    Return the S-JTSK coordinates of the centre of the obec in the column.
+    """
+    return ORIGIN_X + (column + 0.5) * CELL, ORIGIN_Y + 0.5 * CELL
+
+
+def kod_obce(column):
+    return 500000 + column
+
+
+@pytest.fixture(scope="session")
+def obce():
+    """
+    A row of COLUMNS square obce, two obce in every okres and four in every kraj.
+    """
+    geometries = [shapely.box(ORIGIN_X + column * CELL, ORIGIN_Y, ORIGIN_X + (column + 1) * CELL, ORIGIN_Y + CELL)
+                  for column in range(COLUMNS)]
+    return gpd.GeoDataFrame({"kod_obce": [kod_obce(column) for column in range(COLUMNS)],
+                             "nazev_okre": [f"Okres {column // 2}" for column in range(COLUMNS)],
+                             "nazev_kraj": [f"Kraj {column // 4}" for column in range(COLUMNS)]},
+                            geometry=geometries, crs="EPSG:5514")
+
+
+@pytest.fixture(scope="session")
+def geocoder(obce):
+    return ReverseGeocoder(obce)
+
+
+def gpx_text(segments, extensions=False):
+    """
+    Return a GPX file with a track of the segments - lists of (x, y, time) in S-JTSK,
+    time as "yyyy-mm-ddThh:mm:ssZ" or None. Every point is on its own line and the closing tags
+    are at the end, so appending points keeps the beginning of the file. With extensions every point
+    has a heart rate in the prefixed namespace of the Garmin extensions declared by the root element.
+    """
+    transformer = Transformer.from_crs("EPSG:5514", "EPSG:4326")
+    namespaces = ' xmlns:gpxtpx="http://www.garmin.com/xmlschemas/TrackPointExtension/v1"' if extensions else ""
+    extension = ("<extensions><gpxtpx:TrackPointExtension><gpxtpx:hr>120</gpxtpx:hr>"
+                 "</gpxtpx:TrackPointExtension></extensions>") if extensions else ""
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             f'<gpx version="1.1" creator="test" xmlns="http://www.topografix.com/GPX/1/1"{namespaces}>'
+             '<trk><name>test</name>']
+    for points in segments:
+        lines.append("<trkseg>")
+        for x, y, time in points:
+            lat, lon = transformer.transform(x, y)
+            time_element = f"<time>{time}</time>" if time is not None else ""
+            lines.append(f'<trkpt lat="{lat:.9f}" lon="{lon:.9f}"><ele>250.0</ele>{time_element}{extension}</trkpt>')
+        lines.append("</trkseg>")
+    lines.append("</trk></gpx>")
+    return "\n".join(lines) + "\n"
+
+
+@pytest.fixture
+def write_gpx(tmp_path):
+    """
+    Return a function writing the segments (see gpx_text) to a GPX file in the temporary directory.
+    """
+    def write(segments, name="track.gpx", extensions=False):
+        path = tmp_path / name
+        path.write_text(gpx_text(segments, extensions), encoding="utf-8")
+        return str(path)
+    return write
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+import geo_store
+from geo_store import GeoDataStore, OBCE_PATH
+
+
+@pytest.fixture
+def shapefile(obce, tmp_path, monkeypatch):
+    """
+    Write the test obce to OBCE_PATH in the temporary directory, which becomes the working directory.
+    """
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.dirname(OBCE_PATH))
+    obce.assign(nazev_obce=[f"Obec {kod}" for kod in obce["kod_obce"]]).to_file(OBCE_PATH)
+
+
+@pytest.fixture
+def built(monkeypatch):
+    """
+    Return the list of calls of topology.build_arcs made by the GeoDataStore.
+    """
+    calls = []
+
+    def build_arcs(*args):
+        calls.append(args)
+        return original(*args)
+
+    original = geo_store.build_arcs
+    monkeypatch.setattr(geo_store, "build_arcs", build_arcs)
+    return calls
+
+
+def test_cache_can_be_disabled(shapefile):
+    store = GeoDataStore(cache_directory=None)
+    assert len(store.layer(OBCE_PATH)) == 10
+    assert len(store.arcs(0.0)) > 0
+    assert not os.path.exists(geo_store.CACHE_DIRECTORY)
+
+
+def test_cached_arcs_are_rebuilt_for_another_topology_version(shapefile, tmp_path, monkeypatch, built):
+    cache = str(tmp_path / "cache")
+    arcs = GeoDataStore(cache).arcs(0.0)
+    assert len(built) == 1
+    assert GeoDataStore(cache).arcs(0.0).equals(arcs)
+    assert len(built) == 1
+
+    monkeypatch.setattr(geo_store, "ARCS_VERSION", geo_store.ARCS_VERSION + 1)
+    GeoDataStore(cache).arcs(0.0)
+    assert len(built) == 2
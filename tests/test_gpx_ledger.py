@@ -0,0 +1,116 @@
+import os
+
+import pytest
+
+from conftest import cell_center, kod_obce
+from gpx_ledger import import_gpx, plan_import
+from gpx_stream import first_visits, iter_gpx_chunks, MODE_POINTS, MODE_SEGMENTS
+from visit_store import VisitStore
+
+USER = "pepa"
+
+
+def track(columns, first_minute=0):
+    """
+    Return the points in the centres of the obce in the columns, one minute apart.
+    """
+    return [(*cell_center(column), f"2024-05-01T10:{first_minute + idx:02d}:00Z")
+            for idx, column in enumerate(columns)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    visit_store = VisitStore(str(tmp_path / "users.db"))
+    visit_store.add_user(USER)
+    yield visit_store
+    visit_store.close()
+
+
+def test_unchanged_file_is_not_read_again(store, write_gpx, geocoder):
+    path = write_gpx([track([0, 1, 2])])
+    matches = import_gpx(store, USER, path, geocoder, MODE_POINTS)
+    assert matches == {kod_obce(0): "2024-05-01", kod_obce(1): "2024-05-01", kod_obce(2): "2024-05-01"}
+
+    plan = plan_import(store, USER, path, MODE_POINTS)
+    assert plan.start is None
+    assert plan.matches == matches
+    assert import_gpx(store, USER, path, geocoder, MODE_POINTS) == matches
+
+
+def test_copy_of_imported_file_is_found_by_hash(store, write_gpx, geocoder):
+    matches = import_gpx(store, USER, write_gpx([track([0, 1])]), geocoder, MODE_POINTS)
+    plan = plan_import(store, USER, write_gpx([track([0, 1])], name="copy.gpx"), MODE_POINTS)
+    assert plan.start is None
+    assert plan.matches == matches
+
+
+def test_other_mode_is_read_again(store, write_gpx, geocoder):
+    path = write_gpx([track([0, 1])])
+    import_gpx(store, USER, path, geocoder, MODE_POINTS)
+    assert plan_import(store, USER, path, MODE_SEGMENTS).start == 0
+
+
+@pytest.mark.parametrize("mode", [MODE_POINTS, MODE_SEGMENTS])
+def test_appended_points_are_read_from_the_last_point(store, write_gpx, geocoder, mode):
+    path = write_gpx([track([0, 1, 2])])
+    import_gpx(store, USER, path, geocoder, mode)
+    old_size = os.path.getsize(path)
+
+    write_gpx([track([0, 1, 2]) + track([5, 6], first_minute=3)])
+    plan = plan_import(store, USER, path, mode)
+    assert 0 < plan.start < old_size
+    # the last point read before is read again
+    assert plan.points == 2
+    assert list(plan.matches) == [kod_obce(0), kod_obce(1), kod_obce(2)]
+
+    # the same obce as reading the whole file, in MODE_SEGMENTS also those crossed between the old and new points
+    matches = import_gpx(store, USER, path, geocoder, mode)
+    assert matches == first_visits(path, geocoder, mode)
+    if mode == MODE_SEGMENTS:
+        assert list(matches) == [kod_obce(column) for column in range(7)]
+    else:
+        assert list(matches) == [kod_obce(column) for column in (0, 1, 2, 5, 6)]
+
+    assert plan_import(store, USER, path, mode).start is None
+
+
+def test_appended_file_with_namespaced_extensions_is_resumed(store, write_gpx, geocoder):
+    path = write_gpx([track([0, 1, 2])], extensions=True)
+    import_gpx(store, USER, path, geocoder, MODE_SEGMENTS)
+
+    write_gpx([track([0, 1, 2]) + track([5, 6], first_minute=3)], extensions=True)
+    plan = plan_import(store, USER, path, MODE_SEGMENTS)
+    assert plan.start > 0
+    assert import_gpx(store, USER, path, geocoder, MODE_SEGMENTS) == first_visits(path, geocoder, MODE_SEGMENTS)
+
+    # the offset of the last point is stored correctly for the next resume
+    write_gpx([track([0, 1, 2]) + track([5, 6], first_minute=3) + track([9], first_minute=5)], extensions=True)
+    assert plan_import(store, USER, path, MODE_SEGMENTS).start > plan.start
+    assert list(import_gpx(store, USER, path, geocoder, MODE_SEGMENTS)) == [kod_obce(column) for column in range(10)]
+
+
+def test_reading_from_offset_starts_at_the_last_point(store, write_gpx, geocoder):
+    path = write_gpx([track([0, 1, 2])])
+    import_gpx(store, USER, path, geocoder, MODE_POINTS)
+    write_gpx([track([0, 1, 2]) + track([5, 6], first_minute=3)])
+    plan = plan_import(store, USER, path, MODE_POINTS)
+
+    position = {}
+    chunks = list(iter_gpx_chunks(path, chunk_size=2, start=plan.start, position=position))
+    assert [len(chunk.lat) for chunk in chunks] == [2, 1]
+    assert position["points"] == 3
+    assert [str(time) for chunk in chunks for time in chunk.time] == ["2024-05-01T10:02:00", "2024-05-01T10:03:00",
+                                                                      "2024-05-01T10:04:00"]
+
+
+def test_changed_file_is_read_whole(store, write_gpx, geocoder):
+    path = write_gpx([track([0, 1, 2])])
+    import_gpx(store, USER, path, geocoder, MODE_POINTS)
+
+    # the first point moved, new points appended
+    write_gpx([track([3, 1, 2, 5])])
+    plan = plan_import(store, USER, path, MODE_POINTS)
+    assert plan.start == 0
+    assert plan.matches == {}
+    assert list(import_gpx(store, USER, path, geocoder, MODE_POINTS)) == [kod_obce(3), kod_obce(1), kod_obce(2),
+                                                                          kod_obce(5)]
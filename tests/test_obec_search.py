@@ -0,0 +1,51 @@
+from obec_search import ObecSearch
+
+OBCE = [
+    ("Praha", "Praha", 554782),
+    ("Prachatice", "Prachatice", 550094),
+    ("Benešov", "Praskolesy", 531651),
+    ("Žďár nad Sázavou", "Nové Město na Moravě", 596230),
+    ("Náchod", "Nové Město nad Metují", 574121),
+    ("Benešov", "Lhota", 529001),
+    ("Kolín", "Lhota", 533001),
+    # a part of the obec repeats it
+    ("Kolín", "Lhota", 533001),
+]
+
+
+def names(matches):
+    return [(name, okres) for name, okres, _ in matches]
+
+
+def test_names_starting_with_the_text_shortest_first():
+    search = ObecSearch(OBCE)
+    # names of the same length alphabetically
+    assert names(search.search("pra")) == [("Praha", "Praha"), ("Prachatice", "Prachatice"),
+                                           ("Praskolesy", "Benešov")]
+    assert search.search("Praha", limit=1) == [("Praha", "Praha", 554782)]
+
+
+def test_diacritics_and_case_are_ignored():
+    search = ObecSearch(OBCE)
+    assert names(search.search("NOVE mesto  na")) == [("Nové Město na Moravě", "Žďár nad Sázavou"),
+                                                      ("Nové Město nad Metují", "Náchod")]
+
+
+def test_other_words_of_the_name_match_after_the_whole_names():
+    search = ObecSearch(OBCE)
+    assert names(search.search("mesto")) == [("Nové Město na Moravě", "Žďár nad Sázavou"),
+                                             ("Nové Město nad Metují", "Náchod")]
+    assert names(search.search("metuji")) == [("Nové Město nad Metují", "Náchod")]
+
+
+def test_okres_after_comma_tells_apart_the_same_names():
+    search = ObecSearch(OBCE)
+    assert search.search("lhota") == [("Lhota", "Benešov", 529001), ("Lhota", "Kolín", 533001)]
+    assert search.search("lhota, ko") == [("Lhota", "Kolín", 533001)]
+
+
+def test_names_with_typos_are_found():
+    search = ObecSearch(OBCE)
+    assert names(search.search("prachatcie"))[0] == ("Prachatice", "Prachatice")
+    assert search.search("xyz") == []
+    assert search.search("  ") == []
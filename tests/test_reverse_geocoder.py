@@ -0,0 +1,53 @@
+import numpy as np
+
+from conftest import cell_center, kod_obce, ORIGIN_X, ORIGIN_Y
+from gpx_stream import first_visits, MODE_SEGMENTS
+from reverse_geocoder import OUTSIDE
+
+
+def points(columns):
+    x, y = zip(*(cell_center(column) for column in columns))
+    return np.array(x), np.array(y)
+
+
+def test_lookup(geocoder):
+    x, y = points([0, 3, 9])
+    kody = geocoder.lookup(np.append(x, ORIGIN_X - 500.0), np.append(y, ORIGIN_Y))
+    assert kody.tolist() == [kod_obce(0), kod_obce(3), kod_obce(9), OUTSIDE]
+
+
+def test_crossings_find_obce_between_sparse_points(geocoder):
+    x, y = points([0, 4])
+    time = np.array(["2024-05-01T10:00:00", "2024-05-01T10:04:00"], dtype="datetime64[s]")
+    kody, times = geocoder.crossings(x, y, time, np.zeros(2, dtype=np.int64))
+
+    assert kody.tolist() == [kod_obce(column) for column in range(5)]
+    # the obce are entered in the middle between the centres, the time is interpolated along the line
+    assert [str(entry) for entry in times] == ["2024-05-01T10:00:00", "2024-05-01T10:00:30", "2024-05-01T10:01:30",
+                                               "2024-05-01T10:02:30", "2024-05-01T10:03:30"]
+
+
+def test_crossings_do_not_join_segments(geocoder):
+    x, y = points([0, 4])
+    time = np.full(2, np.datetime64("NaT"), dtype="datetime64[s]")
+    kody, times = geocoder.crossings(x, y, time, np.array([0, 1]))
+    assert kody.tolist() == [kod_obce(0), kod_obce(4)]
+    assert np.isnat(times).all()
+
+
+def test_segment_split_between_chunks_is_joined(write_gpx, geocoder):
+    sparse = [(*cell_center(column), f"2024-05-01T10:{column:02d}:00Z") for column in (0, 3, 6, 9)]
+    path = write_gpx([sparse])
+
+    whole = first_visits(path, geocoder, MODE_SEGMENTS)
+    assert list(whole) == [kod_obce(column) for column in range(10)]
+    for chunk_size in (1, 2, 3):
+        assert first_visits(path, geocoder, MODE_SEGMENTS, chunk_size=chunk_size) == whole
+
+
+def test_segments_split_between_chunks_are_not_joined(write_gpx, geocoder):
+    path = write_gpx([[(*cell_center(column), None) for column in (0, 3)],
+                      [(*cell_center(column), None) for column in (6, 9)]])
+    expected = [kod_obce(column) for column in (0, 1, 2, 3, 6, 7, 8, 9)]
+    for chunk_size in (1, 2, 3, 4):
+        assert list(first_visits(path, geocoder, MODE_SEGMENTS, chunk_size=chunk_size)) == expected
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+import shapely
+
+from topology import build_arcs, LEVEL_KRAJ, LEVEL_OBEC, LEVEL_OKRES, NO_NEIGHBOUR, SNAP_GRID
+
+# 2 x 2 unit squares:   c d    a, b - same okres and kraj
+#                       a b    c - other okres of the kraj of a, b    d - other kraj
+GEOMETRIES = [shapely.box(0, 0, 1, 1), shapely.box(1, 0, 2, 1), shapely.box(0, 1, 1, 2), shapely.box(1, 1, 2, 2)]
+OKRESY = np.array(["O1", "O1", "O2", "O3"])
+KRAJE = np.array(["K1", "K1", "K1", "K2"])
+
+
+def inner_arcs(lines, level, left, right):
+    """
+    Return {(obec, obec): (level, length)} of the arcs between two obce.
+    """
+    border = right != NO_NEIGHBOUR
+    return {tuple(sorted((int(a), int(b)))): (int(arc_level), float(length))
+            for a, b, arc_level, length in zip(left[border], right[border], level[border],
+                                               shapely.length(lines[border]))}
+
+
+def test_shared_edges_are_kept_once_with_the_level_of_the_border():
+    lines, level, left, right = build_arcs(GEOMETRIES, OKRESY, KRAJE)
+
+    border = right != NO_NEIGHBOUR
+    assert np.count_nonzero(border) == 4
+    assert inner_arcs(lines, level, left, right) == {(0, 1): (LEVEL_OBEC, 1.0), (0, 2): (LEVEL_OKRES, 1.0),
+                                                     (1, 3): (LEVEL_KRAJ, 1.0), (2, 3): (LEVEL_KRAJ, 1.0)}
+    # the state border
+    assert (level[~border] == LEVEL_KRAJ).all()
+    # every border is drawn once - the arcs are as long as the perimeter and the inner edges
+    assert shapely.length(lines).sum() == 8.0 + 4.0
+
+
+def test_level_codes_are_compared_like_names():
+    names = build_arcs(GEOMETRIES, OKRESY, KRAJE)
+    codes = build_arcs(GEOMETRIES, np.array([0, 0, 1, 2]), np.array([0, 0, 0, 1]))
+    assert inner_arcs(*names) == inner_arcs(*codes)
+
+
+def test_vertices_closer_than_the_snap_grid_are_shared():
+    nudged = [GEOMETRIES[0], shapely.box(1 + SNAP_GRID / 10, 0, 2, 1)]
+    assert list(inner_arcs(*build_arcs(nudged, OKRESY[:2], KRAJE[:2]))) == [(0, 1)]
+
+
+
+def test_obce_not_sharing_vertices_are_rejected():
+    # every edge would be a state border, drawn as a kraj border
+    apart = [shapely.box(0, 0, 1, 1), shapely.box(1 + SNAP_GRID * 10, 0, 2, 1), shapely.box(0, 1.1, 1, 2)]
+    with pytest.raises(ValueError):
+        build_arcs(apart, OKRESY[:3], KRAJE[:3])
+
+    # a single obec without neighbours (e.g. an island) is fine
+    island = GEOMETRIES + [shapely.box(5, 5, 6, 6)]
+    lines, level, left, right = build_arcs(island, np.append(OKRESY, "O4"), np.append(KRAJE, "K2"))
+    assert (right[left == 4] == NO_NEIGHBOUR).all()
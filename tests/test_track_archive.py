@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+import pytest
+
+import track_archive
+from conftest import cell_center, kod_obce
+from gpx_ledger import import_gpx
+from gpx_stream import first_visits, merge_first_visits, MODE_POINTS, MODE_SEGMENTS
+from track_archive import TrackArchive
+from visit_store import VisitStore
+
+USER = "pepa"
+
+
+def track(columns, day, segment_break=None):
+    """
+    Return the segments of a track through the centres of the obce in the columns, one minute apart.
+    """
+    points = [(*cell_center(column), f"{day}T10:{idx:02d}:00Z") for idx, column in enumerate(columns)]
+    if segment_break is None:
+        return [points]
+    return [points[:segment_break], points[segment_break:]]
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return TrackArchive(USER, str(tmp_path / "tracks"))
+
+
+@pytest.fixture
+def imported(tmp_path, write_gpx, geocoder, archive):
+    """
+    Import two GPX files to the archive, return their paths.
+    """
+    store = VisitStore(str(tmp_path / "users.db"))
+    store.add_user(USER)
+    paths = [write_gpx(track([0, 1, 4], "2024-05-01"), name="a.gpx"),
+             write_gpx(track([2, 3, 7, 9], "2023-05-01", segment_break=2), name="b.gpx")]
+    for path in paths:
+        import_gpx(store, USER, path, geocoder, MODE_SEGMENTS, archive)
+    store.close()
+    return paths
+
+
+def test_stored_points_round_trip(imported, archive):
+    lines = archive.query()
+    assert sorted(zip(lines["track"], lines["segment"])) == [("a.gpx", 0), ("b.gpx", 0), ("b.gpx", 1)]
+
+    x, y, time, line_idx = archive.points(lines[lines["track"] == "b.gpx"].sort_values("segment"))
+    assert np.allclose(np.column_stack((x, y)), [cell_center(column) for column in (2, 3, 7, 9)], atol=1e-6)
+    assert [str(value) for value in time] == ["2023-05-01T10:00:00", "2023-05-01T10:01:00",
+                                              "2023-05-01T10:02:00", "2023-05-01T10:03:00"]
+    assert line_idx.tolist() == [0, 0, 1, 1]
+
+    # only the lines of the day are found by time
+    assert archive.query(time_from="2024-05-01", time_to="2024-05-01")["track"].tolist() == ["a.gpx"]
+    # staging archives are removed after the import
+    assert os.listdir(archive.directory) == ["pepa.gpkg"]
+
+
+@pytest.mark.parametrize("mode", [MODE_POINTS, MODE_SEGMENTS])
+@pytest.mark.parametrize("batch_rows", [1, 100])
+def test_rematch_finds_the_visits_of_the_files(imported, archive, geocoder, monkeypatch, mode, batch_rows):
+    monkeypatch.setattr(track_archive, "BATCH_ROWS", batch_rows)
+    expected = {}
+    for path in imported:
+        merge_first_visits(expected, first_visits(path, geocoder, mode))
+
+    visits = archive.rematch(geocoder, mode, chunk_size=2)
+    assert visits == expected
+    # the obce of both tracks keep the earlier date
+    assert visits[kod_obce(2)] == "2023-05-01"
+    assert visits[kod_obce(0)] == "2024-05-01"
+
+
+def test_rematch_of_empty_archive(archive, geocoder):
+    assert archive.rematch(geocoder) == {}
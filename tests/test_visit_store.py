@@ -0,0 +1,119 @@
+import sqlite3
+
+import pytest
+
+from conftest import kod_obce
+from stats_engine import CoverageStats
+from visit_store import COUNTRY, COVERAGE_KRAJ, COVERAGE_OKRES, COVERAGE_STAT, VisitStore
+
+USER = "pepa"
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "users.db")
+
+
+@pytest.fixture
+def store(path):
+    visit_store = VisitStore(path)
+    visit_store.add_user(USER)
+    yield visit_store
+    visit_store.close()
+
+
+def test_add_visits_skips_visited_obce(store):
+    assert store.add_visits(USER, [(kod_obce(0), "2024-05-01"), (kod_obce(1), None), (kod_obce(0), "2024-06-01")]) == 2
+    assert store.add_visits(USER, [(kod_obce(1), "2024-05-02"), (kod_obce(2), "2024-05-02")]) == 1
+    assert sorted(store.visited_ids(USER)) == [kod_obce(0), kod_obce(1), kod_obce(2)]
+    assert store.add_visits("nobody", [(kod_obce(3), None)]) == 0
+
+
+def test_add_visits_counts_only_rows_inserted(store, path):
+    # the visited obce of the user are cached before another process adds some of them
+    assert store.add_visits(USER, [(kod_obce(0), None)]) == 1
+    other = VisitStore(path)
+    assert other.add_visits(USER, [(kod_obce(1), None), (kod_obce(2), None)]) == 2
+    other.close()
+
+    assert store.add_visits(USER, [(kod_obce(1), None), (kod_obce(3), None), (kod_obce(2), None)]) == 1
+    assert kod_obce(3) in store.visited(USER)
+    reopened = VisitStore(path)
+    assert reopened.visited_ids(USER).tolist() == [kod_obce(column) for column in range(4)]
+    reopened.close()
+
+
+def test_legacy_user_tables_are_migrated(path):
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("CREATE TABLE pepa (id INTEGER PRIMARY KEY, obecID TEXT, dat DATE)")
+        conn.executemany("INSERT INTO pepa (obecID, dat) VALUES (?, ?)",
+                         [(str(kod_obce(0)), "2020-01-02"), (str(kod_obce(1)), None), (str(kod_obce(0)), "2021-01-01")])
+        # users named like the tables of the new schema, the oldest tables have no date column
+        conn.execute("CREATE TABLE visits (id INTEGER PRIMARY KEY, obecID TEXT)")
+        conn.execute("INSERT INTO visits (obecID) VALUES (?)", (str(kod_obce(2)),))
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, obecID TEXT, dat DATE)")
+        conn.execute("INSERT INTO users (obecID, dat) VALUES (?, ?)", (str(kod_obce(3)), "2022-03-04"))
+    conn.close()
+
+    store = VisitStore(path)
+    assert sorted(store.users()) == ["pepa", "users", "visits"]
+    assert store.visited_ids("pepa").tolist() == [kod_obce(0), kod_obce(1)]
+    assert store.visited_ids("visits").tolist() == [kod_obce(2)]
+    assert store.visited_ids("users").tolist() == [kod_obce(3)]
+    # the first visit of an obec is kept with its date
+    assert store.visits_between("pepa", "2020-01-01", "2021-12-31") == [("02-01-2020", kod_obce(0), "")]
+    store.close()
+
+    # the old tables are dropped, opening the database again migrates nothing
+    store = VisitStore(path)
+    assert sorted(store.users()) == ["pepa", "users", "visits"]
+    assert len(store.visited_ids("pepa")) == 2
+    store.close()
+
+
+@pytest.fixture
+def stats(obce):
+    return CoverageStats(obce, "nazev_kraj", "nazev_okre")
+
+
+def test_coverage_counters_follow_the_visits(store, stats):
+    # the counters of the user created before the regions were known are built
+    assert store.set_regions(stats) == [USER]
+    assert store.check_coverage() == []
+    store.add_visits(USER, [(kod_obce(0), None), (kod_obce(1), None), (kod_obce(4), None)])
+    store.add_visit(USER, kod_obce(9), "2024-05-01")
+
+    assert store.coverage(USER, COVERAGE_STAT) == {COUNTRY: 40.0}
+    assert store.coverage(USER, COVERAGE_KRAJ) == {"Kraj 0": 50.0, "Kraj 1": 25.0, "Kraj 2": 50.0}
+    assert list(store.top_regions(USER, COVERAGE_OKRES, count=2)) == ["Okres 0", "Okres 2"]
+
+    store.remove_visit(USER, kod_obce(0))
+    assert store.coverage(USER, COVERAGE_KRAJ)["Kraj 0"] == 25.0
+    assert store.check_coverage() == []
+
+
+def test_coverage_counters_of_concurrent_stores(store, stats, path):
+    store.set_regions(stats)
+    store.add_visits(USER, [(kod_obce(0), None)])
+    other = VisitStore(path)
+    other.set_regions(stats)
+    other.add_visits(USER, [(kod_obce(1), None)])
+    other.close()
+
+    # the obec added by the other store is not counted twice
+    assert store.add_visits(USER, [(kod_obce(1), None), (kod_obce(2), None)]) == 1
+    assert store.coverage(USER, COVERAGE_STAT) == {COUNTRY: 30.0}
+    assert store.check_coverage() == []
+
+
+def test_wrong_coverage_counters_are_rebuilt(store, stats, path):
+    store.set_regions(stats)
+    store.add_visits(USER, [(kod_obce(0), None), (kod_obce(5), None)])
+    with store.conn:
+        store.conn.execute("UPDATE coverage SET visited = visited + 3 WHERE level = ?", (COVERAGE_KRAJ,))
+
+    reopened = VisitStore(path)
+    assert reopened.set_regions(stats) == [USER]
+    assert reopened.coverage(USER, COVERAGE_KRAJ) == {"Kraj 0": 25.0, "Kraj 1": 25.0, "Kraj 2": 0.0}
+    reopened.close()